@@ -0,0 +1,44 @@
+import polars as pl
+
+from continents import CONTINENT
+
+
+# Statistics of every continent x year x indicator cell
+CUBE_SCHEMA = {
+    "Continent": CONTINENT,
+    "year": pl.UInt16,
+    "indicator": pl.Enum,
+    "count": pl.UInt32,
+    "mean": pl.Float32,
+    "median": pl.Float32,
+    "q25": pl.Float32,
+    "q75": pl.Float32,
+    "min": pl.Float32,
+    "max": pl.Float32,
+}
+
+
+### Continent cube
+def build_continent_cube(data, indicators):
+    # Long format, then one group-by for all the cells (empty cells are left out)
+    values = data.filter(pl.col("Continent").is_not_null()).unpivot(
+        index=["Continent", "year"],
+        on=indicators,
+        variable_name="indicator",
+        value_name="value"
+    ).drop_nulls("value")
+
+    value = pl.col("value")
+    return values.group_by(["Continent", "year", "indicator"]).agg(
+        value.count().alias("count"),
+        value.mean().alias("mean"),
+        value.median().alias("median"),
+        value.quantile(0.25, interpolation="linear").alias("q25"),
+        value.quantile(0.75, interpolation="linear").alias("q75"),
+        value.min().alias("min"),
+        value.max().alias("max"),
+    ).with_columns(
+        pl.col("indicator").cast(pl.Enum(indicators)),
+        pl.col("count").cast(pl.UInt32),
+        pl.col("mean", "median", "q25", "q75", "min", "max").cast(pl.Float32)
+    ).sort(["indicator", "Continent", "year"])
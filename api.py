@@ -0,0 +1,202 @@
+import argparse
+import collections
+import functools
+import hashlib
+import http.server
+import io
+import json
+import urllib.parse
+
+import polars as pl
+
+from indexes import build_country_index, build_year_index, query_countries
+from preprocessing import INDICATORS, load_data, snapshot_hash
+from shared import freeze
+
+
+CSV_PATH = "./WDICSV.csv"
+
+# Local only by default, next to the Streamlit app (8501)
+HOST = "127.0.0.1"
+PORT = 8502
+
+ARROW = "application/vnd.apache.arrow.stream"
+JSON = "application/json"
+
+# Encoded responses kept in memory (they only depend on the query and on the data)
+CACHE_SIZE = 1024
+
+
+# The frames of get_data and their indexes, read-only; version identifies the data in the ETags
+Dataset = collections.namedtuple("Dataset", ["world_data", "data", "continent_cube", "year_index", "country_index", "version"])
+
+def load_dataset(url=CSV_PATH):
+    world_data, data, continent_cube = freeze(load_data(url))
+    return Dataset(
+        world_data, data, continent_cube,
+        freeze(build_year_index(data)), freeze(build_country_index(data)),
+        snapshot_hash(url)[:16]
+    )
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+### Queries
+def parse_year(value, name="year"):
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(400, f"{name} must be a year, got {value!r}")
+
+def select_columns(frame, params):
+    # ?columns=year,total_rate keeps only these columns (in this order)
+    if "columns" not in params:
+        return frame
+    columns = params["columns"].split(",")
+    unknown = [column for column in columns if column not in frame.columns]
+    if unknown:
+        raise QueryError(400, f"Unknown columns: {', '.join(unknown)} (available: {', '.join(frame.columns)})")
+    duplicates = sorted({column for column in columns if columns.count(column) > 1})
+    if duplicates:
+        raise QueryError(400, f"Columns asked more than once: {', '.join(duplicates)}")
+    return frame.select(columns)
+
+def query_year(dataset, year, params):
+    # Every country in one year, optionally of one continent
+    rows = dataset.year_index.get(parse_year(year))
+    if rows is None:
+        raise QueryError(404, f"No data for the year {year}")
+    if "continent" in params:
+        rows = rows.filter(pl.col("Continent").cast(pl.String) == params["continent"])
+    return select_columns(rows, params)
+
+def query_country(dataset, country, params):
+    # One country (or World) across the years, optionally in an inclusive ?from=&to= range
+    first = parse_year(params.get("from", 0), "from")
+    last = parse_year(params.get("to", 9999), "to")
+    if country == "World":
+        rows = dataset.world_data.filter(pl.col("year").is_between(first, last))
+    elif country in dataset.country_index.offsets:
+        rows = query_countries(dataset.country_index, [country], (first, last))
+    else:
+        raise QueryError(404, f"Unknown country {country!r}")
+    return select_columns(rows, params)
+
+def query_continents(dataset, params):
+    # Statistics of every continent, year and indicator, optionally of one indicator or continent
+    rows = dataset.continent_cube
+    if "indicator" in params:
+        if params["indicator"] not in INDICATORS.values():
+            raise QueryError(400, f"Unknown indicator {params['indicator']!r} (available: {', '.join(INDICATORS.values())})")
+        rows = rows.filter(pl.col("indicator").cast(pl.String) == params["indicator"])
+    if "continent" in params:
+        rows = rows.filter(pl.col("Continent").cast(pl.String) == params["continent"])
+    return select_columns(rows, params)
+
+def query(dataset, path, params):
+    # /years/2000, /countries/Kenya, /continents
+    parts = [urllib.parse.unquote(part) for part in path.strip("/").split("/")]
+    if len(parts) == 2 and parts[0] == "years":
+        return query_year(dataset, parts[1], params)
+    if len(parts) == 2 and parts[0] == "countries":
+        return query_country(dataset, parts[1], params)
+    if parts == ["continents"]:
+        return query_continents(dataset, params)
+    raise QueryError(404, f"Unknown endpoint {path} (try /years/2000, /countries/Kenya or /continents)")
+
+def encode(frame, fmt):
+    if fmt == ARROW:
+        # Oldest Arrow layout (large_string rather than string_view), that every Arrow reader supports
+        buffer = io.BytesIO()
+        frame.write_ipc_stream(buffer, compat_level=pl.CompatLevel.oldest())
+        return buffer.getvalue()
+    return frame.write_json().encode()
+
+
+### Server
+def response_format(params, accept):
+    # ?format=arrow|json, else the Accept header; JSON by default
+    if "format" in params:
+        if params["format"] not in ("arrow", "json"):
+            raise QueryError(400, f"format must be arrow or json, got {params['format']!r}")
+        return ARROW if params["format"] == "arrow" else JSON
+    return ARROW if ARROW in (accept or "") else JSON
+
+def make_handler(dataset, log=True):
+    @functools.lru_cache(maxsize=CACHE_SIZE)
+    def respond(path, query_string, fmt):
+        # ETag and body of a query: the ETag only depends on the data version and on the (normalized) query
+        params = dict(urllib.parse.parse_qsl(query_string))
+        etag = '"' + hashlib.sha256(f"{dataset.version}|{path}|{query_string}|{fmt}".encode()).hexdigest()[:32] + '"'
+        return etag, encode(query(dataset, path, params), fmt)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        # Keep-alive, so that a client reuses its connection; headers and body are two writes, which Nagle's
+        # algorithm would hold back until the client acknowledges the first one
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            try:
+                fmt = response_format(params, self.headers.get("Accept"))
+                params.pop("format", None)
+                etag, body = respond(url.path, urllib.parse.urlencode(sorted(params.items())), fmt)
+            except QueryError as error:
+                self.send(error.status, JSON, json.dumps({"error": str(error)}).encode())
+                return
+            except Exception as error:
+                # A bug rather than a bad query: answer it (and log it) instead of dropping the connection
+                self.log_error("%s failed: %r", self.path, error)
+                self.send(500, JSON, json.dumps({"error": f"Internal error: {error}"}).encode())
+                return
+
+            # Conditional request: the client's copy is still valid
+            matches = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+            if etag in matches or "*" in matches:
+                self.send(304, fmt, None, etag)
+            else:
+                self.send(200, fmt, body, etag)
+
+        def send(self, status, content_type, body, etag=None):
+            # No body (a 304): no Content-Length either, which would stand for the length of the cached answer
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            if body is not None:
+                self.send_header("Content-Length", str(len(body)))
+            if etag is not None:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")  # Cache, but check the ETag every time
+                self.send_header("Vary", "Accept")
+            self.end_headers()
+            if body is not None:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if log:
+                super().log_message(format, *args)
+
+    return Handler
+
+def make_server(dataset, host=HOST, port=PORT, log=True):
+    # One thread per connection; the frames are shared read-only by every thread
+    return http.server.ThreadingHTTPServer((host, port), make_handler(dataset, log))
+
+
+# python api.py [--host 127.0.0.1] [--port 8502] [--csv ./WDICSV.csv]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the preprocessed indicators as JSON or Arrow over HTTP")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--csv", default=CSV_PATH, help="WDI export to serve")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args()
+
+    server = make_server(load_dataset(args.csv), args.host, args.port, log=not args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_port} (/years/2000, /countries/Kenya, /continents)")
+    server.serve_forever()
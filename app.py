@@ -1,116 +1,107 @@
+import math
 import polars as pl
-import altair as alt
 import streamlit as st
-import pandas as pd
-import requests
-import pydeck as pdk
-import numpy as np
+import time
 
-import matplotlib
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import matplotlib.colorbar as cbar
-
-from matplotlib.colors import Normalize
-from matplotlib.colors import TwoSlopeNorm
-from matplotlib.cm import ScalarMappable
-
-import pycountry_convert as pc
-import pycountry
-from PIL import Image
+from preprocessing import INDICATORS, indicator_versions, load_data, snapshot_hash
+from charts import altair_chart, chart_data, stack
+from profiling import debug_panel, finish_rerun, profiled, start_rerun, timed
+from shared import freeze
+from indexes import (
+    available_countries, available_years, build_availability_index, build_country_index, country_coverage, coverage,
+    build_year_index, query_countries
+)
 
 
 st.set_page_config(layout="wide", initial_sidebar_state="expanded")
 
+# Timings of this rerun, only in debug mode (?debug=1)
+start_rerun()
+
 
 ### Preprocessing
 url='./WDICSV.csv'
 
-@st.cache_data
-def get_data(url):
-    # Read CSV with specified null values and limit rows
-    data = pl.read_csv(
-        url,
-        null_values=["null", "NA", "NaN", "", ".."]
-    ).slice(0, 1962)
-
-    # Unpivot the DataFrame to long format
-    data = data.unpivot(
-        index=["Country Name", "Country Code", "Series Name", "Series Code"],  
-        variable_name="year",         
-        value_name="rate"            
-    )
-    
-    # Pivot the DataFrame to wide format
-    data = data.pivot(
-        index=["Country Name", "Country Code", "year"], 
-        on="Series Name",                      
-        values="rate"                            
-    )
-
-    # Rename columns for clarity
-    data = data.rename({
-        "Access to electricity (% of population)": "total_rate",
-        "Access to electricity, rural (% of rural population)": "rural_rate",
-        "Access to electricity, urban (% of urban population)": "urban_rate",
-        "Electricity production from oil, gas and coal sources (% of total)": "oil_gas_coal",
-        "Electricity production from nuclear sources (% of total)": "nuclear",
-        "Electricity production from hydroelectric sources (% of total)": "hydroelectric",
-        "Electricity production from renewable sources, excluding hydroelectric (% of total)": "renewable",
-        "GDP per capita (constant 2015 US$)" : "GDP",
-        "Energy imports, net (% of energy use)": "energy_imports"
-    }).with_columns(
-        pl.col("year").str.slice(0, 4).alias("year")  
-    )
-
-    # Function to create country to continent mapping
-    def create_continent_mapping():
-        mapping = {}
-        for country in pycountry.countries:
-            try:
-                alpha2 = country.alpha_2
-                continent_code = pc.country_alpha2_to_continent_code(alpha2)
-                continent_name = pc.convert_continent_code_to_continent_name(continent_code)
-                mapping[country.alpha_3] = continent_name
-            except:
-                mapping[country.alpha_3] = None
-        return mapping
-        
-    # Create the continent mapping
-    continent_mapping = create_continent_mapping()
-
-    # Create a DataFrame for mapping continents
-    mapping_df = pl.DataFrame({
-        "Country Code": list(continent_mapping.keys()),
-        "Continent": list(continent_mapping.values())})
-
-    # Join the mapping with the main data
-    data = data.join(mapping_df, on="Country Code", how="left")
-
-    # Manually assign continents to specific countries
-    data = data.with_columns(
-        pl.when(pl.col("Country Name") == "Timor-Leste").then(pl.lit("Asia"))
-        .when(pl.col("Country Name") == "Channel Islands").then(pl.lit("Europe"))
-        .when(pl.col("Country Name") == "Kosovo").then(pl.lit("Europe"))
-        .when(pl.col("Country Name") == "Sint Maarten (Dutch part)").then(pl.lit("North America"))
-        .when(pl.col("Country Name") == "World").then(pl.lit("World"))
-        .otherwise(pl.col("Continent"))
-        .alias("Continent")
-    )
-
-    # Combine Asia and Oceania into Asia/Oceania
-    data = data.with_columns(
-        pl.when(pl.col("Continent").is_in(["Asia", "Oceania"])).then(pl.lit("Asia/Oceania"))
-          .otherwise(pl.col("Continent"))
-          .alias("Continent")
-    )
-
-    world_data=data.filter(pl.col("Country Name")=="World")
-    data=data.filter(pl.col("Country Name")!="World")
-
-    return world_data, data
-
-world_data, data=get_data(url)
+# Version of the data: a new export of the CSV (refreshed incrementally) is picked up by the next rerun, and the
+# cached frames and indexes of the previous version are dropped
+version = snapshot_hash(url)
+
+@timed("get_data")
+@st.cache_resource(max_entries=1)
+def get_data(url, version):
+    # Load the preprocessed data and the continent cube from their snapshot (rebuilt only when the CSV changes),
+    # once per process: every session reads the same read-only frames instead of its own unpickled copy
+    return freeze(load_data(url))
+
+world_data, data, continent_cube=get_data(url, version)
+
+@timed("indexes")
+@st.cache_resource(max_entries=1)
+def get_year_index(url, version):
+    # Year -> slice of data, built once per process and shared by every session
+    _, data, _ = get_data(url, version)
+    return freeze(build_year_index(data))
+
+year_index = get_year_index(url, version)
+
+@timed("filter")
+def data_for_year(year):
+    # Rows of the selected year, without scanning the whole frame (an empty frame is only built on a miss)
+    rows = year_index.get(year)
+    return rows if rows is not None else data.clear()
+
+@timed("indexes")
+@st.cache_resource(max_entries=1)
+def get_country_index(url, version):
+    # Country -> slice of data sorted by year, built once per process and shared by every session
+    _, data, _ = get_data(url, version)
+    return freeze(build_country_index(data))
+
+country_index = get_country_index(url, version)
+
+@timed("filter")
+def data_for_countries(countries, years=None):
+    # Rows of the selected countries (and inclusive year range), without scanning the whole frame
+    return query_countries(country_index, countries, years)
+
+@timed("indexes")
+@st.cache_resource(max_entries=1)
+def get_availability(url, version):
+    # Available values of every indicator, for World and for the countries, built once per process
+    world_data, data, _ = get_data(url, version)
+    indicators = list(INDICATORS.values())
+    return build_availability_index(world_data, indicators), build_availability_index(data, indicators)
+
+world_availability, availability = get_availability(url, version)
+
+@timed("indexes")
+@st.cache_resource(max_entries=1)
+def get_continent_countries(url, version):
+    # Sorted countries of every continent, built once per process (the coverage page reads their availability)
+    _, data, _ = get_data(url, version)
+    countries = data.select("Continent", pl.col("Country Name").cast(pl.String)).unique().drop_nulls().sort(
+        "Country Name"
+    )
+    return freeze({
+        continent: tuple(rows.get_column("Country Name").to_list())
+        for (continent,), rows in countries.group_by("Continent")
+    })
+
+continent_countries = get_continent_countries(url, version)
+
+@st.cache_resource(max_entries=1)
+def get_indicator_versions(url, version):
+    # Version of every indicator: the caches that depend on some indicators only (map frames) are kept when a
+    # new export revises the others
+    get_data(url, version)
+    return freeze(indicator_versions(url))
+
+versions = get_indicator_versions(url, version)
+
+def server_side():
+    # Charts computed on the server: stacks arrive precomputed and hovering doesn't need the nearest point
+    # (a Voronoi diagram in the browser), for slow clients. Toggled in the sidebar or with ?charts=server
+    return st.session_state.get("server_side", False)
 
 
 # Introduction
@@ -129,7 +120,6 @@ variable_descriptions = [
     {"Variable": "GDP", "Description": "GDP per capita is gross domestic product divided by midyear population. GDP is the sum of gross value added by all resident producers in the economy plus any product taxes and minus any subsidies not included in the value of the products. It is calculated without making deductions for depreciation of fabricated assets or for depletion and degradation of natural resources. Data are in constant 2015 U.S. dollars.", "Example": "1195.41"},
     {"Variable": "Continent", "Description": "Continent the country belongs", "Example": "Africa"}
     ]
-variable_table = pd.DataFrame(variable_descriptions)
 
 
 
@@ -144,37 +134,45 @@ color_map_continents = {
 }
 
 
+# Every chart below is a fragment: its widgets rerun only the chart, not the whole page
+
+
 # Access to electricity
+@st.fragment
+@profiled
 def linechart_world():
-    # Slider to select year range
+    import altair as alt
+
+    # Slider to select year range (years with data for World)
+    first_year, last_year = available_years(world_availability, ["total_rate"])
     year_range = st.slider(
         "Select years:",
-        min_value=1998,
-        max_value=2022,
-        value=(1998, 2022)
+        min_value=first_year,
+        max_value=last_year,
+        value=(first_year, last_year)
     )
 
     # Filter data for World and selected years
     filtered_data=world_data.filter(
-        pl.col("year").cast(int).is_between(year_range[0], year_range[1])
+        pl.col("year").is_between(year_range[0], year_range[1])
     )
 
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["year"],  # Field to trigger selection
-        nearest=True,     # Select nearest point
+        nearest=not server_side(),     # Select nearest point (in the browser)
         on="mouseover",   # Trigger on mouseover
         empty="none"      # No selection by default
     )
 
     # Line chart for total_rate over years
-    line = alt.Chart(filtered_data).mark_line().encode(
+    line = alt.Chart().mark_line().encode(
         x=alt.X("year:O", title="Year"),
         y=alt.Y("total_rate:Q", title="Access to Electricity (%)", scale=alt.Scale(zero=False)),
     )
 
     # Adding points on the line with tooltips
-    points = alt.Chart(filtered_data).mark_point(size=50, filled=True).encode(
+    points = alt.Chart().mark_point(size=50, filled=True).encode(
         x=alt.X("year:O"),
         y=alt.Y("total_rate:Q"),
         size=alt.condition(
@@ -190,175 +188,122 @@ def linechart_world():
         highlight
     )
 
-    # Combine line and points
-    chart = (line + points).properties(
+    # Combine line and points, sharing the encoded columns as one dataset
+    chart = alt.layer(line, points, data=chart_data(filtered_data, ["year", "total_rate"])).properties(
         width=800,
         height=400
     )
 
     # Display the chart in Streamlit
-    st.altair_chart(chart, use_container_width=True)
-
-
-@st.cache_data
-def load_geojson():
-    geojson_url = "https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json"
-    response = requests.get(geojson_url)
-    geojson = response.json()
-    return geojson
-
-def merge_data_access(data, geojson):
-    # Create a dictionary associating Country Code to total_rate 
-    data_dict = data.set_index('Country Code')['total_rate'].to_dict()
-
-    # Add 'total_rate' to each GeoJSON feature
-    for feature in geojson['features']:
-        country_code = feature['id']
-        total_rate = data_dict.get(country_code, None)
-        if pd.notnull(total_rate):  
-            feature["properties"]["total_rate"] = round(float(total_rate), 2) 
-        else:
-            feature["properties"]["total_rate"] = None
-    return geojson
-
-def assign_color(geojson, min_rate, max_rate, colormap_name, variable, missing_color=[105, 105, 105]):
-    # Get the colormap from matplotlib
-    colormap = matplotlib.colormaps.get_cmap(colormap_name)
-    
-    # Normalize the rate values
-    normalize = mcolors.Normalize(vmin=min_rate, vmax=max_rate)
-
-    # Iterate over each feature in the GeoJSON
-    for feature in geojson["features"]:
-        rate = feature["properties"].get(variable)
-        if rate is None or pd.isnull(rate):  
-            feature["properties"]["fill_color"] = missing_color   # Assign missing color
-        else:
-            # Get the color from the colormap
-            color = colormap(normalize(rate))  # [R, G, B, A]
-            feature["properties"]["fill_color"] = [int(255 * c) for c in color[:3]]  # Convert to RGB
-    return geojson 
-
-def create_legend(colormap_name, min_rate, max_rate, text, missing_color=[105, 105, 105]):
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(0.7, 4))
-    fig.subplots_adjust(left=0.5, right=0.8, top=0.9, bottom=0.1)
-
-    # Set transparent background
-    fig.patch.set_facecolor('none')  
-    ax.set_facecolor('none')       
-    # Add descriptive text
-    ax.text(0, 110, text, fontsize=10, color='white', va='center')
-
-    # Get the colormap
-    colormap = matplotlib.colormaps.get_cmap(colormap_name)
-
-    # Normalize the rate values
-    norm = Normalize(vmin=min_rate, vmax=max_rate)
-
-    # Create the colorbar
-    cbar_instance = cbar.ColorbarBase(
-        ax,
-        cmap=colormap,
-        norm=norm,
-        orientation='vertical'
-    )
-
-    # White ticks
-    cbar_instance.ax.tick_params(colors='white')   
-
-    # Add legend for missing data
-    ax_missing = fig.add_axes([0.5, 0.005, 0.3, 0.05])  
-    ax_missing.set_xticks([])
-    ax_missing.set_yticks([])
-    ax_missing.set_xlim(0, 1)
-    ax_missing.set_ylim(0, 1)
-    ax_missing.add_patch(plt.Rectangle((0, 0), 1, 1, color=[c / 255 for c in missing_color]))
-        
-    ax_text = fig.add_axes([0.9, 0.005, 0.3, 0.05])  
-    ax_text.set_xticks([])
-    ax_text.set_yticks([])
-    ax_text.set_xlim(0, 1)
-    ax_text.set_ylim(0, 1)
-    ax_text.text(0, 0.5, "No Data", fontsize=10, color='white', va='center')
-    ax_text.set_facecolor('black') 
-    
-    return fig
-
+    altair_chart(chart, "linechart_world")
+
+
+# One set of map frames per map and energy source (total_rate, disparity, energy_imports and the four sources of
+# map_energy_sources). Sets of a previous version of the indicators are never read again, so they are the least
+# recently used ones, evicted as a new export adds the sets of the revised indicators
+MAP_FRAMES = 7
+
+@timed("map frames")
+@st.cache_resource(max_entries=MAP_FRAMES)
+def cached_map_frames(columns, colormap_name, min_rate, max_rate, vcenter, column_versions):
+    from maps import build_map_frames
+
+    # Attributes and colors of a map for every year, computed once and shared by every session
+    map_data = data.with_columns(
+        (pl.col("urban_rate") - pl.col("rural_rate")).alias("disparity")  # Used by map_disparity
+    )
+    return freeze(build_map_frames(map_data, list(columns), colormap_name, min_rate, max_rate, vcenter))
+
+def map_versions(columns):
+    # Versions of the map's indicators (disparity is computed from urban_rate and rural_rate)
+    sources = {"disparity": ("urban_rate", "rural_rate")}
+    return tuple(versions[source] for column in columns for source in sources.get(column, (column,)))
+
+def get_map_frames(columns, colormap_name, min_rate, max_rate, vcenter=None):
+    # Cached by the versions of the map's indicators
+    return cached_map_frames(columns, colormap_name, min_rate, max_rate, vcenter, map_versions(columns))
+
+# One set of decks per animated map and energy source (map_access and the four sources of map_energy_sources)
+MAP_DECKS = 5
+
+@timed("map decks")
+@st.cache_resource(max_entries=MAP_DECKS)
+def cached_map_decks(columns, colormap_name, min_rate, max_rate, tooltip, years, column_versions):
+    from maps import SerializedDeck, map_deck
+
+    # Deck of every year of the slider (first, last), built and serialized once and shared by every session:
+    # playing the map only sends them
+    frames = get_map_frames(columns, colormap_name, min_rate, max_rate)
+    return freeze({
+        year: SerializedDeck(map_deck(*frames[year], tooltip=tooltip))
+        for year in range(years[0], years[1] + 1)
+    })
+
+def get_map_decks(columns, colormap_name, min_rate, max_rate, tooltip, years):
+    # Cached by the versions of the map's indicators, like the frames
+    return cached_map_decks(columns, colormap_name, min_rate, max_rate, tooltip, years, map_versions(columns))
+
+def play_map(map_placeholder, decks, years, selected_year):
+    # Show the serialized map of every year, one after the other, then the map of the selected year again. Any
+    # interaction stops the animation: Streamlit interrupts the run at the next map it sends
+    for year in years:
+        with map_placeholder.container():
+            st.markdown(f"**{year}**")
+            st.pydeck_chart(decks[year])
+        time.sleep(0.5)
+    map_placeholder.pydeck_chart(decks[selected_year])
+
+@st.fragment
+@profiled
 def map_access():
-    # Load GeoJSON data
-    geojson = load_geojson()
+    from legends import create_legend
 
-    # Slider to select the year
+    # Slider to select the year (years with data)
+    first_year, last_year = available_years(availability, ["total_rate"])
     selected_year = st.slider(
         "Select the year:",
-        min_value=1990,
-        max_value=2015,
-        value=2000,
-    )
-    
-    # Filter data for the selected year 
-    filtered_data = (
-        data.filter(pl.col("year") == str(selected_year))
-            .select(["Country Name", "Country Code", "total_rate"])
-            .drop_nulls(["total_rate"])
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year),
+        key="map_access_year",
     )
 
-    # Merge filtered data with GeoJSON data
-    merged_geojson = merge_data_access(filtered_data.to_pandas(), geojson)
+    # Button to animate the map through the years of the slider
+    play = st.button("▶ Play", key="map_access_play")
 
     min_rate = 0
     max_rate = 100
 
-    # Assign colors
-    merged_geojson = assign_color(merged_geojson, min_rate, max_rate, variable="total_rate", colormap_name="Reds")
-
-    # Create a GeoJSON layer for the map
-    geojson_layer = pdk.Layer(
-        "GeoJsonLayer",
-        data=merged_geojson,
-        pickable=True,
-        filled=True,
-        stroked=True,
-        get_fill_color="properties.fill_color",  
-        get_line_color=[0, 0, 0],
-        line_width_min_pixels=1
-    )
-
-    # Set the initial view of the map
-    view_state = pdk.ViewState(
-        latitude=35,
-        longitude=15,
-        zoom=0.4,
-        pitch=0
-    )
-
     # Set tooltip
-    deck = pdk.Deck(
-        layers=[geojson_layer],
-        initial_view_state=view_state,
-        tooltip={
-            "html": "<b>Country:</b> {name}<br/><b>Access (%): </b> {total_rate}",
-            "style": {"color": "white"},
-        },
-    )
+    tooltip = {
+        "html": "<b>Country:</b> {name}<br/><b>Access (%): </b> {total_rate}",
+        "style": {"color": "white"},
+    }
+
+    # Map of every year, precomputed and serialized
+    decks = get_map_decks(("total_rate",), "Reds", min_rate, max_rate, tooltip, (first_year, last_year))
 
     # Create two columns
     col1, col2 = st.columns([7, 1])  
     with col1:
         # Display the map
-        st.pydeck_chart(deck)
+        map_placeholder = st.empty()
+        map_placeholder.pydeck_chart(decks[selected_year])
     with col2:
         # Display the legend
-        fig = create_legend('Reds', min_rate, max_rate, text="Access to \nelectricity (%)")
-        st.pyplot(fig)
+        st.markdown(create_legend('Reds', min_rate, max_rate, text="Access to \nelectricity (%)"), unsafe_allow_html=True)
+
+    if play:
+        play_map(map_placeholder, decks, range(first_year, last_year + 1), selected_year)
 
 
+@st.fragment
+@profiled
 def linechart_countries():
-    # Filter countries with at least one value for total_rate
-    countries = sorted(data.filter(
-        pl.col("total_rate").is_not_null()
-        ).select("Country Name").unique().to_series().to_list())
+    import altair as alt
+
+    # Countries with at least one value for total_rate
+    countries = available_countries(availability, ["total_rate"])
  
     # Select countries
     selected_countries = st.multiselect(
@@ -369,19 +314,17 @@ def linechart_countries():
         key="selected_countries",
     )
     
-    # Select the year range
+    # Select the year range (years with data)
+    first_year, last_year = available_years(availability, ["total_rate"])
     year_range = st.slider(
         "Select years:",
-        min_value=1990,
-        max_value=2022,
-        value=(1990, 2022)
+        min_value=first_year,
+        max_value=last_year,
+        value=(first_year, last_year)
     )
    
-    # Filter data for the selected countries and year range
-    filtered_data = data.filter(
-        (pl.col("Country Name").is_in(selected_countries)) &
-        (pl.col("year").cast(int).is_between(year_range[0], year_range[1]))
-    )
+    # Data for the selected countries and year range
+    filtered_data = data_for_countries(selected_countries, year_range)
 
     if len(filtered_data) == 0:
         st.warning("Select at least one country with available data")
@@ -390,20 +333,20 @@ def linechart_countries():
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["year"],  # Field to trigger selection
-        nearest=True,     # Select nearest point
+        nearest=not server_side(),     # Select nearest point (in the browser)
         on="mouseover",   # Trigger on mouseover
         empty="none"      # No selection by default
     )
 
     # Line chart for total_rate for the selected countries
-    line = alt.Chart(filtered_data).mark_line().encode(
+    line = alt.Chart().mark_line().encode(
         x=alt.X("year:O", title="Year"),
         y=alt.Y("total_rate:Q", title="Access to electricity (%)", scale=alt.Scale(zero=False)),
         color=alt.Color("Country Name:N", title="Country")
     )
 
     # Adding points on the line with tooltips
-    points = alt.Chart(filtered_data).mark_point(size=50, filled=True).encode(
+    points = alt.Chart().mark_point(size=50, filled=True).encode(
         x=alt.X("year:O"),
         y=alt.Y("total_rate:Q"),
         color=alt.Color("Country Name:N"),
@@ -421,30 +364,122 @@ def linechart_countries():
         highlight 
     )
 
-    # Combine line and points
-    chart = (line + points).properties(
+    # Combine line and points, sharing the encoded columns as one dataset
+    chart = alt.layer(line, points, data=chart_data(filtered_data, ["Country Name", "year", "total_rate"])).properties(
         width=800,
         height=400
     )
 
     # Display the chart in Streamlit
-    st.altair_chart(chart, use_container_width=True)
+    altair_chart(chart, "linechart_countries")
+
+
+@st.fragment
+@profiled
+def continent_trend_chart():
+    import altair as alt
+
+    # Select the indicator
+    indicators = continent_cube.schema["indicator"].categories.to_list()
+    indicator = st.selectbox(
+        "Select one indicator:",
+        indicators,
+        index=indicators.index("total_rate"),
+        key="continent_trend_indicator"
+    )
+
+    # Select the year range (years with data for the indicator)
+    first_year, last_year = available_years(availability, [indicator])
+    year_range = st.slider(
+        "Select years:",
+        min_value=first_year,
+        max_value=last_year,
+        value=(first_year, last_year),
+        key="continent_trend_years"
+    )
+
+    # Precomputed statistics of the indicator for every continent and year (no aggregation here)
+    filtered_data = continent_cube.filter(
+        (pl.col("indicator") == indicator) &
+        (pl.col("year").is_between(year_range[0], year_range[1]))
+    )
+
+    if filtered_data.is_empty():
+        st.warning("No available data for the selected years")
+        return
+
+    # Color scale for continents
+    continent_color = alt.Color(
+        "Continent:N",
+        title="Continent",
+        scale=alt.Scale(
+            domain=list(color_map_continents.keys()),
+            range=list(color_map_continents.values())
+        )
+    )
+
+    # Band between the first and the third quartile of the countries
+    band = alt.Chart().mark_area(opacity=0.2).encode(
+        x=alt.X("year:O", title="Year"),
+        y=alt.Y("q25:Q", title=f"{indicator} (median and interquartile range)"),
+        y2="q75:Q",
+        color=continent_color
+    )
+
+    # Median line
+    line = alt.Chart().mark_line().encode(
+        x=alt.X("year:O"),
+        y=alt.Y("median:Q"),
+        color=continent_color
+    )
+
+    # Points with the statistics in the tooltip
+    points = alt.Chart().mark_point(size=50, filled=True).encode(
+        x=alt.X("year:O"),
+        y=alt.Y("median:Q"),
+        color=continent_color,
+        tooltip=[
+            alt.Tooltip("Continent:N", title="Continent"),
+            alt.Tooltip("year:N", title="Year"),
+            alt.Tooltip("count:Q", title="Countries"),
+            alt.Tooltip("median:Q", title="Median", format=".2f"),
+            alt.Tooltip("mean:Q", title="Mean", format=".2f"),
+            alt.Tooltip("q25:Q", title="First quartile", format=".2f"),
+            alt.Tooltip("q75:Q", title="Third quartile", format=".2f"),
+            alt.Tooltip("min:Q", title="Min", format=".2f"),
+            alt.Tooltip("max:Q", title="Max", format=".2f")
+        ]
+    )
+
+    # Combine band, line and points, sharing the encoded columns as one dataset
+    chart = alt.layer(band, line, points, data=chart_data(filtered_data.drop("indicator"))).properties(
+        width=800,
+        height=400
+    )
+
+    # Display the chart in Streamlit
+    altair_chart(chart, "continent_trend_chart")
 
 
 
 # Access to electricity in urban and rural areas
+@st.fragment
+@profiled
 def scatterplot_urban_rural():
-    # Slider to select the year
+    import altair as alt
+
+    # Slider to select the year (years with data)
+    first_year, last_year = available_years(availability, ["urban_rate", "rural_rate"])
     selected_year = st.slider(
         "Select the year:",
-        min_value=1990,
-        max_value=2022,
-        value=2015,
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2015, first_year), last_year),
+        key="scatterplot_urban_rural_year",
     )
 
     # Filter data for selected year, remove World and null values
-    filtered_data = data.filter(
-        (pl.col("year") == str(selected_year)) &  
+    filtered_data = data_for_year(selected_year).filter(
         (pl.col("urban_rate").is_not_null()) 
     ).select(["Country Name", "Continent","urban_rate", "rural_rate"])
 
@@ -452,32 +487,29 @@ def scatterplot_urban_rural():
         st.warning("Nessun dato disponibile per l'anno selezionato.")
         return
     
-    # Filter countries with at least one value for urban rate
-    countries = sorted(data.filter(
-        pl.col("urban_rate").is_not_null()
-        ).select("Country Name").unique().to_series().to_list())
+    # Countries with at least one value for urban rate
+    countries = available_countries(availability, ["urban_rate"])
 
     # Select a country
     selected_country = st.selectbox(
         "Search for one country: ",
         countries,
-        index=countries.index("Kenya")
+        index=countries.index("Kenya"),
+        key="scatterplot_urban_rural_country",
     )
 
-    # Split data for selected country and other countries
-    selected_country_data = filtered_data.filter(pl.col("Country Name") == selected_country)
-    other_countries_data = filtered_data.filter(pl.col("Country Name") != selected_country)
-
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["Country Name"],  # Field to trigger selection
-        nearest=True,     # Select nearest point
+        nearest=not server_side(),     # Select nearest point (in the browser)
         on="mouseover",   # Trigger on mouseover
         empty="none"      # No selection by default
     )
 
     # Base chart for other countries
-    base_chart = alt.Chart(other_countries_data.to_pandas()).mark_point(size=100, filled=True).encode(
+    base_chart = alt.Chart().transform_filter(
+        alt.datum["Country Name"] != selected_country
+    ).mark_point(size=100, filled=True).encode(
         x=alt.X("rural_rate:Q", title="Access to Electricity in rural areas (%)", scale=alt.Scale(zero=False)),
         y=alt.Y("urban_rate:Q", title="Access to Electricity in urban areas (%)", scale=alt.Scale(zero=False)),
         color=alt.Color(
@@ -503,7 +535,9 @@ def scatterplot_urban_rural():
     )
 
     # Chart for selected country
-    selected_chart = alt.Chart(selected_country_data.to_pandas()).mark_point(size=100, filled=True).encode(
+    selected_chart = alt.Chart().transform_filter(
+        alt.datum["Country Name"] == selected_country
+    ).mark_point(size=100, filled=True).encode(
         x=alt.X("rural_rate:Q", title="Access to Electricity in rural areas (%)", scale=alt.Scale(zero=False)),
         y=alt.Y("urban_rate:Q", title="Access to Electricity in urban areas (%)", scale=alt.Scale(zero=False)),
         color=alt.Color(
@@ -524,96 +558,44 @@ def scatterplot_urban_rural():
         highlight 
     )
 
-    # Combine the base chart and chart for the selected country
-    chart = alt.layer(base_chart, selected_chart).configure_view(strokeWidth=0
+    # Combine the base chart and chart for the selected country, which filter the same dataset
+    chart = alt.layer(base_chart, selected_chart, data=chart_data(filtered_data)).configure_view(strokeWidth=0
               ).properties(
                 width=800,
                 height=600
     )
 
     # Display the chart in Streamlit    
-    st.altair_chart(chart, use_container_width=True)
-
-
-def merge_data_disparity(data, geojson):
-    # Create a dictionary mapping Country Code to a sub-dictionary with the variables disparity, urban_rate, rural_rate
-    data_dict = data.set_index('Country Code')[['disparity', "urban_rate", "rural_rate"]].to_dict(orient='index')
-
-    # Iterate over each country in the GeoJSON
-    for feature in geojson['features']:
-        country_code = feature['id']
-        country_data = data_dict.get(country_code, None) # Get data for the country if available
-        if country_data:
-            # Extract values for disparity, urban_rate, and rural_rate
-            disparity=country_data.get("disparity", None)
-            urban_rate=country_data.get("urban_rate", None)
-            rural_rate=country_data.get("rural_rate", None)
-            # Check if disparity is not null before assigning values
-            if pd.notnull(disparity):  
-                feature["properties"]["disparity"] = round(float(disparity), 2) 
-                feature["properties"]["urban_rate"] = round(float(urban_rate), 2)
-                feature["properties"]["rural_rate"] = round(float(rural_rate), 2)
-            else:
-                # Assign None if data is missing
-                feature["properties"]["disparity"] = None
-                feature["properties"]["urban_rate"] = None
-                feature["properties"]["rural_rate"] = None
-    return geojson
+    altair_chart(chart, "scatterplot_urban_rural")
+
 
+@st.fragment
+@profiled
 def map_disparity():
-    # Load GeoJSON data
-    geojson = load_geojson()
+    from maps import map_deck
+    from legends import create_legend
 
-    # Slider to select the year
+    # Slider to select the year (years with data)
+    first_year, last_year = available_years(availability, ["urban_rate", "rural_rate"])
     selected_year = st.slider(
         "Select the year:",
-        min_value=1990,
-        max_value=2022,
-        value=2000,
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year),
+        key="map_disparity_year",
     )
 
-    # Compute disparity values
-    disparity=pl.col("urban_rate")-pl.col("rural_rate")
-
-    # Filter data for the selected year
-    filtered_data = (
-        data.filter(pl.col("year") == str(selected_year))
-            .select(["Country Name", "Country Code", "urban_rate", "rural_rate", disparity.alias("disparity")])
-            )
-    
-    # Merge filtered data with GeoJSON data
-    merged_geojson = merge_data_disparity(filtered_data.to_pandas(), geojson)
-
     min_rate = 0
     max_rate = 100
 
-    # Assign colors
-    merged_geojson = assign_color(merged_geojson, min_rate, max_rate, colormap_name="Blues", variable="disparity")
+    # Disparity (urban_rate - rural_rate) and colors of every country, precomputed for every year
+    frames = get_map_frames(("disparity", "urban_rate", "rural_rate"), "Blues", min_rate, max_rate)
+    attributes, colors = frames[selected_year]
 
-    # Create a GeoJSON layer for the map
-    geojson_layer = pdk.Layer(
-        "GeoJsonLayer",
-        data=merged_geojson,
-        pickable=True,
-        filled=True,
-        stroked=True,
-        get_fill_color="properties.fill_color",  
-        get_line_color=[0, 0, 0],
-        line_width_min_pixels=1
-    )
-
-    # Set the initial view of the map
-    view_state = pdk.ViewState(
-        latitude=35,
-        longitude=15,
-        zoom=0.4,
-        pitch=0
-    )
-
-    # Set tooltip
-    deck = pdk.Deck(
-        layers=[geojson_layer],
-        initial_view_state=view_state,
+    # Create the map and set tooltip
+    deck = map_deck(
+        attributes,
+        colors,
         tooltip={
             "html": "<b>Country:</b> {name}<br/><b>Disparity: </b> {disparity}<br/><b>Access in urban areas (%): </b> {urban_rate}<br/><b>Access in rural areas (%): </b> {rural_rate}",
             "style": {"color": "white"},
@@ -627,47 +609,41 @@ def map_disparity():
         st.pydeck_chart(deck)
     with col2:
         # Display the legend
-        fig = create_legend('Blues', min_rate, max_rate, text="Disparity (%)")
-        st.pyplot(fig)
+        st.markdown(create_legend('Blues', min_rate, max_rate, text="Disparity (%)"), unsafe_allow_html=True)
 
 
 
 # Access to electricity vs GPD
+@st.fragment
+@profiled
 def linechart_access_gdp():
-    # Slider to select year range
+    import altair as alt
+
+    # Slider to select year range (years with data)
+    first_year, last_year = available_years(availability, ["GDP", "total_rate"])
     year_range = st.slider(
         "Select years:",
-        min_value=1990,
-        max_value=2022,
-        value=(1990, 2022)  
+        min_value=first_year,
+        max_value=last_year,
+        value=(first_year, last_year)
     )
 
-    # Filter countries with available GDP and total_rate
-    countries = sorted(data.filter(
-        (pl.col("GDP").is_not_null()) &  
-        (pl.col("total_rate").is_not_null())
-    ).select("Country Name").unique().to_series().to_list())
+    # Countries with available GDP and total_rate
+    countries = available_countries(availability, ["GDP", "total_rate"])
 
     # Select one country
     country = st.selectbox(
         "Select one country: ",
         countries,
-        index=countries.index("Kenya")
+        index=countries.index("Kenya"),
+        key="linechart_access_gdp_country",
     )
 
-    # Filter data for selected country and selected year range
-    filtered_data = data.filter(
-        (pl.col("Country Name") == country) &
-        (pl.col("year").cast(int).is_between(year_range[0], year_range[1]))
-    ).select(
+    # Data for selected country and selected year range
+    filtered_data = data_for_countries([country], year_range).select(
         pl.col("GDP", "year", "total_rate")
     )
 
-    # Converti i dati filtrati in Pandas per Altair e aggiungi un campo "series"
-    filtered_data = filtered_data.to_pandas()
-    total_rate_data = filtered_data.assign(series="Total Rate")
-    gdp_data = filtered_data.assign(series="GDP")
-
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["year", "series"],  # Field to trigger selection
@@ -676,7 +652,7 @@ def linechart_access_gdp():
     )
 
     # Line chart for total_rate 
-    line_a = alt.Chart(total_rate_data).mark_line().encode(
+    line_a = alt.Chart().mark_line().encode(
         x=alt.X("year:O", title="Year"),
         y=alt.Y(
             "total_rate:Q",
@@ -688,7 +664,9 @@ def linechart_access_gdp():
     )
 
     # Add points for total_rate
-    points_a = alt.Chart(total_rate_data).mark_point(size=50, filled=True).encode(
+    points_a = alt.Chart().transform_calculate(
+        series="'Total Rate'"  # Field of the selection, told apart from the GDP points
+    ).mark_point(size=50, filled=True).encode(
         x=alt.X("year:O"),
         y=alt.Y("total_rate:Q"),
         color=alt.value("red"),
@@ -712,7 +690,7 @@ def linechart_access_gdp():
     )
 
     # Line chart for GDP
-    line_b = alt.Chart(gdp_data).mark_line().encode(
+    line_b = alt.Chart().mark_line().encode(
         x=alt.X("year:O"),
         y=alt.Y(
             "GDP:Q",
@@ -724,7 +702,9 @@ def linechart_access_gdp():
     )
 
     # Add points for GDP
-    points_b = alt.Chart(gdp_data).mark_point(size=50, filled=True).encode(
+    points_b = alt.Chart().transform_calculate(
+        series="'GDP'"
+    ).mark_point(size=50, filled=True).encode(
         x=alt.X("year:O"),
         y=alt.Y("GDP:Q"),
         color=alt.value("blue"),
@@ -747,24 +727,30 @@ def linechart_access_gdp():
         height=450
     )
 
-    # Combine the two graphs with independend y-axes
+    # Combine the two graphs with independend y-axes, sharing one dataset
     chart = alt.layer(
         chart_b,
-        chart_a
+        chart_a,
+        data=chart_data(filtered_data)
     ).resolve_scale(
         y="independent"
     )
 
     # Display the chart in Streamlit
-    st.altair_chart(chart, use_container_width=True)
+    altair_chart(chart, "linechart_access_gdp")
 
+@st.fragment
+@profiled
 def scatterplot_access_gdp():
-    # Slider to select the year
+    import altair as alt
+
+    # Slider to select the year (years with data)
+    first_year, last_year = available_years(availability, ["total_rate", "GDP"])
     selected_year = st.slider(
         "Select the year:",
-        min_value=1990,
-        max_value=2022,
-        value=2000,
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year),
         key="scatterplot_slider"
     )
 
@@ -785,8 +771,7 @@ def scatterplot_access_gdp():
         return
 
     # Filter data for selected year and continents
-    filtered_data = data.filter(
-        (pl.col("year") == str(selected_year)) & 
+    filtered_data = data_for_year(selected_year).filter(
         (pl.col("total_rate").is_not_null()) &
         (pl.col("GDP").is_not_null()) &
         (pl.col("Country Name")!="World") &
@@ -800,13 +785,13 @@ def scatterplot_access_gdp():
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["Country Name"],  
-        nearest=True,     
+        nearest=not server_side(),     
         on="mouseover",   
         empty="none"      
     )
 
     # Chart scatterplot comparing total_rate and GDP
-    chart = alt.Chart(filtered_data.to_pandas()).mark_point(size=100, filled=True).encode(
+    chart = alt.Chart(chart_data(filtered_data)).mark_point(size=100, filled=True).encode(
         x=alt.X("GDP:Q", title="GDP"),
         y=alt.Y("total_rate:Q", title="Access to Electricity (%)"),
         tooltip=[
@@ -834,157 +819,47 @@ def scatterplot_access_gdp():
     )
 
     # Display the chart in Streamlit    
-    st.altair_chart(chart, use_container_width=True)
+    altair_chart(chart, "scatterplot_access_gdp")
 
 
 
 # Access to electricity vs energy imports
-def merge_data_imports(data, geojson):
-    # Create a dictionary mapping Country Code to energy_imports
-    data_dict = data.set_index('Country Code')['energy_imports'].to_dict()
-
-    # Iterate over each country in the GeoJSON
-    for feature in geojson['features']:
-        country_code = feature['id']
-        energy_imports = data_dict.get(country_code, None) # Get energy imports value for the country
-        if pd.notnull(energy_imports):  
-            #Assign energy_imports value
-            feature["properties"]["energy_imports"] = round(float(energy_imports), 2) 
-        else:
-            # Assing None if data is missing
-            feature["properties"]["energy_imports"] = None
-    return geojson
-
-def assign_color_imports(geojson, min_rate, max_rate, colormap_name='RdBu', missing_color=[105, 105, 105]):
-    # Normalize values using TwoSlopeNorm, setting vcenter at 0 for diverging colormap
-    norm = TwoSlopeNorm(vmin=min_rate, vcenter=0, vmax=max_rate)
-    
-    # Get the colormap from matplotlib
-    colormap = matplotlib.colormaps.get_cmap(colormap_name)
-    
-    # Iterate over each country in the GeoJSON
-    for feature in geojson["features"]:
-        rate = feature["properties"].get("energy_imports", None) # Get energy import rate
-        if rate is None or pd.isnull(rate):
-            feature["properties"]["fill_color"] = missing_color  # Missing values
-        else:
-            # Normalize the value using TwoSlopeNorm
-            norm_rate = norm(rate)
-            # Get the corresponding color from the colormap
-            color = colormap(norm_rate)  # Returns [R, G, B, A]
-            # Convert RGB values from range [0,1] to [0,255]
-            feature["properties"]["fill_color"] = [int(255 * c) for c in color[:3]]
-    return geojson
-
-@st.cache_data
-def create_legend_imports(colormap_name, min_rate, max_rate, missing_color=[105, 105, 105]):
-    # Crea una figura e un asse
-    fig, ax = plt.subplots(figsize=(4, 60))  # Figura verticale stretta
-    fig.patch.set_facecolor('none')  
-    ax.set_facecolor('none')      
-    # Definisci la normalizzazione con TwoSlopeNorm centrata a 0
-    norm = mcolors.TwoSlopeNorm(vmin=min_rate, vcenter=0, vmax=max_rate)
-
-    # Ottieni la colormap desiderata
-    cmap = plt.get_cmap(colormap_name)
-
-    # Crea un oggetto ScalarMappable per la colorbar
-    sm = ScalarMappable(norm=norm, cmap=cmap)
-    sm.set_array([])  # Necessario per alcuni backend di Matplotlib
-
-    # Crea la colorbar all'interno dell'asse
-    cbar = fig.colorbar(sm, cax=ax, orientation='vertical')
-
-    # Definisci i valori dei tick, assicurandoti che zero sia incluso
-    tick_values = np.linspace(min_rate, max_rate, num=6)
-    if 0 not in tick_values:
-        tick_values = np.unique(np.append(tick_values, 0))
-    
-    # Imposta i tick e le etichette dei tick
-    cbar.set_ticks(tick_values)
-    cbar.set_ticklabels([f"{v:.2f}" for v in tick_values])
-
-    # Imposta l'etichetta della colorbar
-    cbar.ax.text(0.5, 1.05, "Energy \n Imports (%)",
-                    transform=cbar.ax.transAxes,
-                    ha='center', va='bottom',
-                    color='white', fontsize=150)
-    # Personalizza l'aspetto dei tick
-    cbar.ax.tick_params(colors='white', labelsize=120)
-
-    # Imposta il colore del bordo della colorbar
-    cbar.outline.set_edgecolor('white')  # Colore del bordo della colorbar
-    cbar.ax.yaxis.set_tick_params(color='white')  # Colore delle linee dei tick
-
-    ax_inset = fig.add_axes([0.15, 0.01, 0.8, 0.05], facecolor='black')  # [left, bottom, width, height]
-    ax_inset.imshow([[missing_color]], aspect='auto')
-    ax_inset.axis('off')
-    ax_inset.text(0.8, 0.05, 'Missing', va='center', fontsize=120, color='white')
-    
-    return fig
-
+@st.fragment
+@profiled
 def map_imports():
-    # Load GeoJSON data
-    geojson = load_geojson()
+    from maps import map_deck
+    from legends import create_legend_imports
 
-    # Filtering data for the year range (1990, 2014)
-    year_range_data = (
-            data.filter(pl.col("year").cast(pl.Int32).is_between(1990, 2014, closed="both"))
-        )
+    # Years with both energy imports and access to electricity
+    first_year, last_year = available_years(availability, ["total_rate", "energy_imports"])
 
-    # Comunting min and max rate in the year range (1990, 2014)
-    min_rate = year_range_data.select(pl.col("energy_imports")).min().to_numpy()[0]
-    max_rate = year_range_data.select(pl.col("energy_imports")).max().to_numpy()[0]
+    # Min and max rate in the year range, from the continent statistics
+    min_rate, max_rate = continent_cube.filter(
+        (pl.col("indicator") == "energy_imports") &
+        (pl.col("year").is_between(first_year, last_year))
+    ).select(pl.col("min").min(), pl.col("max").max()).row(0)
     
     # Slider to select the year
     selected_year = st.slider(
         "Select the year:",
-        min_value=1990,
-        max_value=2014,
-        value=2000,
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year),
+        key="map_imports_year",
     )
 
-    # Filter data for the selected year
-    filtered_data = (
-        data.filter(pl.col("year") == str(selected_year))
-            .select(["Country Name", "Country Code", "energy_imports"])
-            .drop_nulls(["energy_imports"])
-    )
+    # Energy imports and colors of every country (diverging colormap centered at 0), precomputed for every year
+    frames = get_map_frames(("energy_imports",), "RdBu", min_rate, max_rate, vcenter=0)
+    attributes, colors = frames[selected_year]
 
-    if filtered_data.is_empty():
+    if attributes.get_column("energy_imports").is_null().all():
         st.warning("No available data for the selected year")
         return
 
-    # Merge filtered data with GeoJSON data
-    merged_geojson = merge_data_imports(filtered_data.to_pandas(), geojson)
-    
-    # Assign colors
-    merged_geojson = assign_color_imports(merged_geojson, min_rate, max_rate)
-
-    # Create a GeoJSON layer for the map
-    geojson_layer = pdk.Layer(
-        "GeoJsonLayer",
-        data=merged_geojson,
-        pickable=True,
-        filled=True,
-        stroked=True,
-        get_fill_color="properties.fill_color",  
-        get_line_color=[0, 0, 0],
-        line_width_min_pixels=1
-    )
-
-    # Set the initial view of the map
-    view_state = pdk.ViewState(
-        latitude=35,
-        longitude=15,
-        zoom=0.4,
-        pitch=0
-    )
-
-    # Set tooltip
-    deck = pdk.Deck(
-        layers=[geojson_layer],
-        initial_view_state=view_state,
+    # Create the map and set tooltip
+    deck = map_deck(
+        attributes,
+        colors,
         tooltip={
             "html": "<b>Country:</b> {name}<br/><b>Energy imports (%): </b> {energy_imports}",
             "style": {"color": "white"},
@@ -998,27 +873,35 @@ def map_imports():
         st.pydeck_chart(deck)
     with col2:
         # Display the legend
-        fig = create_legend_imports('RdBu', min_rate, max_rate)  # Passa num_ticks
-        st.pyplot(fig)
+        st.markdown(create_legend_imports('RdBu', min_rate, max_rate), unsafe_allow_html=True)
     
 
+@st.fragment
+@profiled
 def scatterplot_access_imports():
-    # Compute min energy imports overall
+    import altair as alt
+
+    # Years with both energy imports and access to electricity
+    first_year, last_year = available_years(availability, ["total_rate", "energy_imports"])
+
+    # Compute min energy imports overall (again when a new export revises one of the two indicators)
     @st.cache_data
-    def compute_min_energy_imports():
+    def compute_min_energy_imports(first_year, last_year, indicator_versions):
         return data.filter(
-                (pl.col("year").cast(int).is_between(1990, 2014)) & 
+                (pl.col("year").is_between(first_year, last_year)) & 
                 (pl.col("total_rate").is_not_null()) &
                 (pl.col("energy_imports").is_not_null())
             ).select("energy_imports").to_series().min()
-    min_energy_imports = compute_min_energy_imports()
+    min_energy_imports = compute_min_energy_imports(
+        first_year, last_year, (versions["total_rate"], versions["energy_imports"])
+    )
 
     # Slider to select the year
     selected_year = st.slider(
         "Select the year:",
-        min_value=1990,
-        max_value=2014,
-        value=2000, 
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year), 
         key="scatterplot_slider"
     )
 
@@ -1040,8 +923,7 @@ def scatterplot_access_imports():
     
 
     # Filter data for selected year and continents
-    filtered_data = data.filter(
-        (pl.col("year") == str(selected_year)) & 
+    filtered_data = data_for_year(selected_year).filter(
         (pl.col("total_rate").is_not_null()) &
         (pl.col("energy_imports").is_not_null()) &
         (pl.col("Country Name")!="World") &
@@ -1055,13 +937,13 @@ def scatterplot_access_imports():
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["Country Name"],  
-        nearest=True,     
+        nearest=not server_side(),     
         on="mouseover",   
         empty="none"      
     )
 
     # Chart scatterplot comparing total_rate and energy imports
-    chart = alt.Chart(filtered_data.to_pandas()).mark_point(size=100, filled=True).encode(
+    chart = alt.Chart(chart_data(filtered_data)).mark_point(size=100, filled=True).encode(
         x=alt.X("energy_imports:Q", title="Energy imports (%)", scale=alt.Scale(domain=(min_energy_imports, 100))), 
         y=alt.Y("total_rate:Q", title="Access to Electricity (%)", scale=alt.Scale(domain=(1,100))),
         tooltip=[
@@ -1089,7 +971,7 @@ def scatterplot_access_imports():
     )
 
     # Display the chart in Streamlit    
-    st.altair_chart(chart, use_container_width=True)
+    altair_chart(chart, "scatterplot_access_imports")
 
 
 
@@ -1101,18 +983,23 @@ def scatterplot_access_imports():
 
 
 # Energy sources
+@st.fragment
+@profiled
 def energy_trend_chart():
-    # Select year range
+    import altair as alt
+
+    # Select year range (years with data for World)
+    first_year, last_year = available_years(world_availability, ["oil_gas_coal", "nuclear", "hydroelectric", "renewable"])
     year_range = st.slider(
         "Select years:",
-        min_value=1971,
-        max_value=2015,
-        value=(1971, 2015) 
+        min_value=first_year,
+        max_value=last_year,
+        value=(first_year, last_year)
     )
 
     # Filter data from world_data
     filtered_data = world_data.filter( 
-        (pl.col("year").cast(int).is_between(year_range[0], year_range[1]))
+        (pl.col("year").is_between(year_range[0], year_range[1]))
         ).select(["year", "oil_gas_coal", "nuclear", "hydroelectric", "renewable"])
 
     world_data_long = filtered_data.unpivot(
@@ -1124,20 +1011,20 @@ def energy_trend_chart():
     # Selection for highlighting points
     highlight = alt.selection_point(
         fields=["year", "Energy Source"],  
-        nearest=True,     
+        nearest=not server_side(),     
         on="mouseover", 
         empty="none"   
     )
 
     # Line chart for Energy Source
-    line = alt.Chart(world_data_long).mark_line().encode(
+    line = alt.Chart().mark_line().encode(
         x=alt.X("year:O", title="Year", scale=alt.Scale(zero=False)),
         y=alt.Y("Percentage:Q", title="Energy production (%)"),
         color=alt.Color("Energy Source:N", title="Energy Source")
     )
 
     # Add points
-    points = alt.Chart(world_data_long).mark_point(size=50, filled=True).encode(
+    points = alt.Chart().mark_point(size=50, filled=True).encode(
         x=alt.X("year:O"),
         y=alt.Y("Percentage:Q"),
         color=alt.Color("Energy Source:N",scale=alt.Scale(domain=["oil_gas_coal", "nuclear", "hydroelectric", "renewable"])),
@@ -1155,32 +1042,35 @@ def energy_trend_chart():
         highlight  
     )
 
-    # Combine line and points
-    chart = (line + points).properties(
+    # Combine line and points, sharing one dataset
+    chart = alt.layer(line, points, data=chart_data(world_data_long)).properties(
         width=800,
         height=400
     )
 
     # Displaa chart in Streamlit
-    st.altair_chart(chart, use_container_width=True)
+    altair_chart(chart, "energy_trend_chart")
 
+@st.fragment
+@profiled
 def circle_chart():
+    import altair as alt
+
     # Select a country
-    countries = sorted(data.select("Country Name").unique().to_series().to_list())
+    countries = availability.countries
     country = st.selectbox(
         "Select one country: ",
         countries,
-        index=countries.index("Kenya")
+        index=countries.index("Kenya"),
+        key="circle_chart_country",
     )
 
     # Select a year
-    year = st.slider("Select the year: ", min_value=1960, max_value=2015, value=1990, key="circle_chart_year_slider" )
+    first_year, last_year = available_years(availability, ["oil_gas_coal"])
+    year = st.slider("Select the year: ", min_value=first_year, max_value=last_year, value=min(max(1990, first_year), last_year), key="circle_chart_year_slider" )
 
-    # Filter data
-    filtered_data=data.filter(
-        (pl.col("Country Name")==country) &
-        (pl.col("year")==str(year))
-    ).select(["oil_gas_coal", "nuclear", "hydroelectric", "renewable"])
+    # Data for the selected country and year
+    filtered_data=data_for_countries([country], (year, year)).select(["oil_gas_coal", "nuclear", "hydroelectric", "renewable"])
 
     filtered_data_long = filtered_data.unpivot(
         variable_name="Energy Source",  
@@ -1193,12 +1083,25 @@ def circle_chart():
         st.warning(f"No data available for {country} in {year}.")
         return
 
+    # Angles of the slices, computed here instead of by the browser
+    if server_side():
+        filtered_data_long = stack(filtered_data_long.sort("Energy Source"), "Percentage", normalize=True).with_columns(
+            pl.col("start", "end") * 2 * math.pi
+        ).with_columns(
+            ((pl.col("start") + pl.col("end")) / 2).alias("middle")
+        )
+        theta = dict(theta=alt.Theta("start:Q", scale=None), theta2=alt.Theta2("end:Q"))
+        label_theta = dict(theta=alt.Theta("middle:Q", scale=None))
+    else:
+        theta = dict(theta=alt.Theta("Percentage:Q"))
+        label_theta = dict(theta=alt.Theta("Percentage:Q", stack=True))
+
     # Pie chart
     chart = (
-        alt.Chart(filtered_data_long)   
+        alt.Chart()   
         .mark_arc(radius=80, radius2=130, cornerRadius=10)  
         .encode(
-            theta=alt.Theta("Percentage:Q"),  
+            **theta,
             color=alt.Color("Energy Source:N",scale=alt.Scale(domain=["oil_gas_coal", "nuclear", "hydroelectric", "renewable"])),
             tooltip=[
                 alt.Tooltip("Energy Source"),
@@ -1209,31 +1112,33 @@ def circle_chart():
 
     # Set labels
     text=(
-        alt.Chart(filtered_data_long)
+        alt.Chart()
             .mark_text(radius=160, radius2=150, cornerRadius=100, size=20).encode(
-                theta=alt.Theta("Percentage:Q", stack=True),
+                **label_theta,
                 text=alt.Text("Percentage:Q", format=".2f"),
                 color=alt.Color("Energy Source")
             )
         
     )
 
-    # Combine chart and text
-    chart = (
-            chart + text
+    # Combine chart and text, sharing one dataset
+    chart = alt.layer(
+            chart, text, data=chart_data(filtered_data_long)
         ).properties(
             width=150,
             height=400
         )
     
     # Display the chart in Streamlit
-    st.altair_chart(chart, use_container_width=True)
+    altair_chart(chart, "circle_chart")
 
+@st.fragment
+@profiled
 def stackedchart():
-    # List of countries
-    countries = sorted(data.filter(
-        ~pl.col("oil_gas_coal").is_null()  
-    ).select("Country Name").unique().to_series().to_list())
+    import altair as alt
+
+    # Countries with at least one value for the energy sources
+    countries = available_countries(availability, ["oil_gas_coal"])
 
     # Select countries
     selected_countries = st.multiselect(
@@ -1241,34 +1146,45 @@ def stackedchart():
         countries,
         default=["Italy", "France", "Germany", "United States"],
         max_selections=7,
+        key="stackedchart_countries",
     )
 
     if len(selected_countries) == 0:
         st.warning("Select at least one country to visualize the data")
         return
 
-    # Select year
+    # Select year (years with data)
+    first_year, last_year = available_years(availability, ["oil_gas_coal"])
     selected_year = st.slider(
         "Select the year: ",
-        min_value=1960,
-        max_value=2015,
-        value=2000,
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year),
+        key="stackedchart_year",
     )
 
-    # Filter data
-    filtered_data = data.filter(
-        (pl.col("Country Name").is_in(selected_countries)) & 
-        (pl.col("year") == str(selected_year))
-    ).select(["Country Name", "oil_gas_coal", "nuclear", "renewable", "hydroelectric"]
+    # Data for the selected countries and year
+    filtered_data = data_for_countries(selected_countries, (selected_year, selected_year)).select(
+        ["Country Name", "oil_gas_coal", "nuclear", "renewable", "hydroelectric"]
     ).unpivot(
         index="Country Name",  
         variable_name="Energy Source",  
         value_name="Percentage", 
     )
     
+    # Normalized stacks of every country, computed here instead of by the browser
+    if server_side():
+        filtered_data = stack(filtered_data.sort("Energy Source"), "Percentage", by="Country Name", normalize=True)
+        position = dict(
+            x=alt.X("start:Q", title="Energy production (%)", axis=alt.Axis(format="%")),
+            x2=alt.X2("end:Q")
+        )
+    else:
+        position = dict(x=alt.X("sum(Percentage):Q", stack="normalize", title="Energy production (%)"))
+
     # Chart
-    chart = alt.Chart(filtered_data).mark_bar().encode(
-        x=alt.X("sum(Percentage):Q", stack="normalize", title="Energy production (%)"),
+    chart = alt.Chart(chart_data(filtered_data)).mark_bar().encode(
+        **position,
         y=alt.Y("Country Name:N", title="Country"),
         color=alt.Color("Energy Source:N", 
                         title="Energy source",
@@ -1284,98 +1200,127 @@ def stackedchart():
     )
 
     # Display chart
-    st.altair_chart(chart, use_container_width=True)
-
-def merge_data_energy_source(data, geojson, selected_source):
-    # Create a dictionary mapping Country Code to the selected source
-    data_dict = data.set_index('Country Code')[selected_source].to_dict()
-
-    # Iterate over each country in the GeoJSON
-    for feature in geojson['features']:
-        country_code = feature['id']
-        value = data_dict.get(country_code, None) 
-        if pd.notnull(value):  
-            #Assign selected source a value
-            feature["properties"][selected_source] = round(float(value), 2) 
-        else:
-            # Assing None if data is missing
-            feature["properties"][selected_source] = None
-    return geojson
+    altair_chart(chart, "stackedchart")
 
+@st.fragment
+@profiled
 def map_energy_sources():
-    # Load GeoJSON data
-    geojson = load_geojson()
+    from legends import create_legend
 
-    # Slider to select the year
+    # Slider to select the year (years with data for the energy sources)
+    sources = ["oil_gas_coal", "nuclear", "hydroelectric", "renewable"]
+    first_year, last_year = available_years(availability, sources)
     selected_year = st.slider(
         "Select the year:",
-        min_value=1960,
-        max_value=2015,
-        value=2000,
+        min_value=first_year,
+        max_value=last_year,
+        value=min(max(2000, first_year), last_year),
+        key="map_energy_sources_year",
     )
 
-    sources = ["oil_gas_coal", "nuclear", "hydroelectric", "renewable"]
     selected_source = st.selectbox(
         "Select one energy source:",
         sources,
-        index=sources.index("oil_gas_coal"))
-    
-    # Filter data for the selected year 
-    filtered_data = (
-        data.filter(pl.col("year") == str(selected_year))
-            .select(["Country Name", "Country Code", selected_source])
-            .drop_nulls([selected_source])
+        index=sources.index("oil_gas_coal"),
+        key="map_energy_sources_source",
     )
-
-    # Merge filtered data with GeoJSON data
-    merged_geojson = merge_data_energy_source(filtered_data.to_pandas(), geojson, selected_source=selected_source)
+    
+    # Button to animate the map through the years of the slider
+    play = st.button("▶ Play", key="map_energy_sources_play")
 
     min_rate = 0
     max_rate = 100
 
-    # Assign colors
-    merged_geojson = assign_color(merged_geojson, min_rate, max_rate, variable=selected_source, colormap_name="Greens")
-
-    # Create a GeoJSON layer for the map
-    geojson_layer = pdk.Layer(
-        "GeoJsonLayer",
-        data=merged_geojson,
-        pickable=True,
-        filled=True,
-        stroked=True,
-        get_fill_color="properties.fill_color",  
-        get_line_color=[0, 0, 0],
-        line_width_min_pixels=1
-    )
-
-    # Set the initial view of the map
-    view_state = pdk.ViewState(
-        latitude=35,
-        longitude=15,
-        zoom=0.4,
-        pitch=0
-    )
-
     # Set tooltip
-    deck = pdk.Deck(
-        layers=[geojson_layer],
-        initial_view_state=view_state,
-        tooltip={
+    tooltip = {
         "html": "<b>Country:</b> {name}<br/><b>" +
                 selected_source + ": {"+selected_source+"}",
         "style": {"color": "white"}
     }
-    )
+
+    # Map of every year, precomputed and serialized
+    decks = get_map_decks((selected_source,), "Greens", min_rate, max_rate, tooltip, (first_year, last_year))
 
     # Create two columns
     col1, col2 = st.columns([7, 1])  
     with col1:
         # Display the map
-        st.pydeck_chart(deck)
+        map_placeholder = st.empty()
+        map_placeholder.pydeck_chart(decks[selected_year])
     with col2:
         # Display the legend
-        fig = create_legend('Greens', min_rate, max_rate, text="Percentage use of \n "+selected_source)
-        st.pyplot(fig)
+        st.markdown(create_legend('Greens', min_rate, max_rate, text="Percentage use of \n "+selected_source), unsafe_allow_html=True)
+
+    if play:
+        play_map(map_placeholder, decks, range(first_year, last_year + 1), selected_year)
+
+
+
+# Data coverage
+@st.fragment
+@profiled
+def coverage_heatmap():
+    import altair as alt
+
+    # Share of the countries with data for every indicator and year (precomputed)
+    chart = alt.Chart(chart_data(coverage(availability))).mark_rect().encode(
+        x=alt.X("year:O", title="Year"),
+        y=alt.Y("indicator:N", title="Indicator", sort=list(INDICATORS.values())),
+        color=alt.Color("coverage:Q", title="Countries with data (%)", scale=alt.Scale(scheme="greens", domain=[0, 100])),
+        tooltip=[
+            alt.Tooltip("indicator:N", title="Indicator"),
+            alt.Tooltip("year:N", title="Year"),
+            alt.Tooltip("countries:Q", title="Countries"),
+            alt.Tooltip("coverage:Q", title="Coverage (%)", format=".1f")
+        ]
+    ).properties(
+        width=800,
+        height=300
+    )
+
+    # Display the chart in Streamlit
+    altair_chart(chart, "coverage_heatmap")
+
+@st.fragment
+@profiled
+def coverage_countries_heatmap():
+    import altair as alt
+
+    # Select the indicator and the continent
+    indicators = list(INDICATORS.values())
+    indicator = st.selectbox(
+        "Select one indicator:",
+        indicators,
+        index=indicators.index("total_rate"),
+        key="coverage_indicator"
+    )
+    continents = list(color_map_continents)
+    continent = st.selectbox(
+        "Select one continent:",
+        continents,
+        key="coverage_continent"
+    )
+
+    # Years with and without a value for every country of the continent (from the availability index)
+    filtered_data = country_coverage(availability, indicator, continent_countries.get(continent, ()))
+
+    # Chart
+    chart = alt.Chart(chart_data(filtered_data)).mark_rect().encode(
+        x=alt.X("year:O", title="Year"),
+        y=alt.Y("Country Name:N", title="Country"),
+        color=alt.Color("available:N", title="Available", scale=alt.Scale(domain=[True, False], range=["#31a354", "#eeeeee"])),
+        tooltip=[
+            alt.Tooltip("Country Name:N", title="Country"),
+            alt.Tooltip("year:N", title="Year"),
+            alt.Tooltip("available:N", title="Available")
+        ]
+    ).properties(
+        width=800,
+        height=alt.Step(12)
+    )
+
+    # Display the chart in Streamlit
+    altair_chart(chart, "coverage_countries_heatmap")
 
 
 
@@ -1390,8 +1335,7 @@ def map_energy_sources():
 
 ### Pages
 def page_introduction():
-    image = Image.open("world_image.jpg")
-    st.image(image, use_container_width=True)
+    st.image("world_image.jpg", use_container_width=True)
     st.markdown("""
         <style>
             .title-container {
@@ -1453,14 +1397,14 @@ def page_introduction():
         st.markdown("### The dataset:")
 
     with col2:
-        st.download_button("Download CSV", data=data.to_pandas().to_csv(index=False), file_name="data.csv", mime="text/csv")
+        st.download_button("Download CSV", data=data.write_csv(), file_name="data.csv", mime="text/csv")
 
     with col3:
-        st.download_button("Download Excel", data=data.to_pandas().to_csv(index=False), file_name="data.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        st.download_button("Download Excel", data=data.write_csv(), file_name="data.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
     st.write(data)
     st.markdown('### Variables description: ')
-    st.table(variable_table)
+    st.table(variable_descriptions)
     
     st.markdown("**Project by Elena Rossetto** | Data Source: [World Bank](https://databank.worldbank.org/source/world-development-indicators)", unsafe_allow_html=True)
     
@@ -1480,6 +1424,11 @@ def page_access_electricity():
     st.markdown("## Comparing countries")
     st.markdown("The chart compares access to electricity across selected countries over time; use the red slider to select a range of years and choose up to five countries to visualize their respective trends")
     linechart_countries()
+    st.markdown("<br><br><br>", unsafe_allow_html=True)
+
+    st.markdown("## Comparing continents")
+    st.markdown("The chart shows the median of the selected indicator across the countries of each continent (line) and the range between the first and the third quartile (band); use the red slider to select a range of years and move the cursor over the points to see the statistics")
+    continent_trend_chart()
 
     st.markdown("""
     ## Is access to electricity increasing over time? How does it varies around the world?
@@ -1582,7 +1531,7 @@ def page_energy_imports():
         unsafe_allow_html=True
     )
     st.markdown("## Map for percentage of energy imports around the world")
-    st.markdown("This interactive map shows the percentage of net energy imports relative to total energy use (1990-2014). Blue countries depend on energy imports, while red countries are net exporters, meaning they produce more energy than they consume. White areas have balanced values. Use the slider to select a year.")
+    st.markdown("This interactive map shows the percentage of net energy imports relative to total energy use (1990-2015). Blue countries depend on energy imports, while red countries are net exporters, meaning they produce more energy than they consume. White areas have balanced values. Use the slider to select a year.")
     
     map_imports()
     st.markdown("<br><br><br>", unsafe_allow_html=True)  
@@ -1649,6 +1598,18 @@ def page_energy_sources():
     - Oil, gas, and coal remain common worldwide, but usage trends vary by country, with some showing increases and others decreases
     """)
 
+def page_data_coverage():
+    st.markdown("# Data coverage")
+
+    st.markdown("## Countries with data")
+    st.markdown("The heatmap shows, for every indicator and year, the percentage of countries with an available value. The year sliders of the other pages start and end with the available years.")
+    coverage_heatmap()
+    st.markdown("<br><br><br>", unsafe_allow_html=True)
+
+    st.markdown("## Available years of every country")
+    st.markdown("Select an indicator and a continent to see the years in which every country has a value.")
+    coverage_countries_heatmap()
+
 
         
 # Navigation
@@ -1658,11 +1619,23 @@ pages = {
     "Access to electricity in urban and rural areas": page_access_urban_rural,
     "Access to electricity vs GDP": page_gdp,
     "Access to electricity vs energy imports": page_energy_imports,
-    "Overview to energy sources around the world": page_energy_sources  
+    "Overview to energy sources around the world": page_energy_sources,
+    "Data coverage": page_data_coverage
 }
 
 st.sidebar.title("Navigation")
-selection = st.sidebar.radio("Select: ", list(pages.keys()))
-
-# Compute selected page
-pages[selection]()
+selection = st.sidebar.radio("Select: ", list(pages.keys()), key="page")
+st.sidebar.toggle(
+    "Compute charts on the server",
+    value=st.query_params.get("charts") == "server",
+    key="server_side",
+    help="Lighter charts for slow devices: stacks are computed before they are sent and points are highlighted only under the mouse"
+)
+
+# Compute selected page; the timings of the rerun (only in debug mode) are written even when it is interrupted
+# (a widget rerun, st.stop or an error)
+try:
+    pages[selection]()
+finally:
+    finish_rerun(selection)
+debug_panel()
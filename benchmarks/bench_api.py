@@ -0,0 +1,86 @@
+import http.client
+import random
+import threading
+import time
+
+from api import ARROW, load_dataset, make_server
+from benchmarks.common import CSV, report
+
+
+def queries(dataset, count, seed=0):
+    # A mix of the three endpoints, as another dashboard would ask them
+    rng = random.Random(seed)
+    years = list(dataset.year_index)
+    countries = list(dataset.country_index.offsets)
+    paths = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.45:
+            paths.append(f"/years/{rng.choice(years)}?columns=Country%20Name,Continent,total_rate")
+        elif kind < 0.9:
+            country = rng.choice(countries).replace(" ", "%20").replace("'", "%27")
+            paths.append(f"/countries/{country}?from=1990&to=2022")
+        else:
+            paths.append(f"/continents?indicator={rng.choice(['total_rate', 'GDP', 'renewable'])}")
+    return paths
+
+def load(port, requests, clients):
+    # Every client sends its share of the (path, headers) requests on its own keep-alive connection; seconds
+    # per request, overall
+    def client(requests):
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        for path, headers in requests:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status not in (200, 304):
+                raise RuntimeError(f"{path}: HTTP {response.status}")
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(requests[i::clients],)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - start) / len(requests)
+
+def etags(port, paths):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    tags = {}
+    for path in paths:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        tags[path] = response.getheader("ETag")
+    connection.close()
+    return tags
+
+def run(count=2000, clients=8):
+    dataset = load_dataset(CSV)
+    paths = queries(dataset, count)
+    results = {}
+
+    # A new server for every format, so that the first pass encodes every answer (cold) and the second reads
+    # them from the response cache; clients and server share the process (and its GIL)
+    for name, headers in [("json", {}), ("arrow", {"Accept": ARROW})]:
+        server = make_server(dataset, port=0, log=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+        results[f"api/{name} per request (cold)"] = load(port, [(path, headers) for path in paths], clients)
+        results[f"api/{name} per request (cached)"] = load(port, [(path, headers) for path in paths], clients)
+        if name == "json":
+            tags = etags(port, set(paths))
+            results["api/304 per request (If-None-Match)"] = load(
+                port, [(path, {"If-None-Match": tags[path]}) for path in paths], clients
+            )
+        server.shutdown()
+        server.server_close()
+
+    for name, seconds in results.items():
+        print(f"{name}: {1 / seconds:,.0f} requests/s ({clients} clients)")
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
@@ -0,0 +1,72 @@
+import tracemalloc
+
+import polars as pl
+from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+
+from benchmarks.common import CSV, measure, report
+from charts import chart_data
+from preprocessing import load_data
+
+
+def legacy_linechart_access_gdp(frame):
+    # pandas copy of the frame, then one more copy per series
+    frame = frame.to_pandas()
+    return [frame.assign(series="Total Rate"), frame.assign(series="GDP")]
+
+def arrow_linechart_access_gdp(frame):
+    return [
+        chart_data(frame.with_columns(series=pl.lit("Total Rate"))),
+        chart_data(frame.with_columns(series=pl.lit("GDP")))
+    ]
+
+def views(data):
+    # Data of the views that used to go through pandas, as their chart functions select it
+    urban_rural = data.filter(
+        (pl.col("year") == 2015) & pl.col("urban_rate").is_not_null() & pl.col("rural_rate").is_not_null()
+    ).select(["Country Name", "Continent", "urban_rate", "rural_rate"])
+    access_gdp = data.filter(
+        (pl.col("year") == 2000) & pl.col("GDP").is_not_null() & pl.col("total_rate").is_not_null()
+    ).select(["Country Name", "Continent", "GDP", "total_rate"])
+    access_imports = data.filter(
+        (pl.col("year") == 2000) & pl.col("energy_imports").is_not_null() & pl.col("total_rate").is_not_null()
+    ).select(["Country Name", "Continent", "energy_imports", "total_rate"])
+    kenya = data.filter(pl.col("Country Name") == "Kenya").select(["GDP", "year", "total_rate"])
+
+    return {
+        "scatterplot_urban_rural": (
+            lambda: [urban_rural.filter(pl.col("Country Name") != "Kenya").to_pandas(),
+                     urban_rural.filter(pl.col("Country Name") == "Kenya").to_pandas()],
+            lambda: [chart_data(urban_rural.filter(pl.col("Country Name") != "Kenya")),
+                     chart_data(urban_rural.filter(pl.col("Country Name") == "Kenya"))],
+        ),
+        "scatterplot_access_gdp": (lambda: [access_gdp.to_pandas()], lambda: [chart_data(access_gdp)]),
+        "scatterplot_access_imports": (lambda: [access_imports.to_pandas()], lambda: [chart_data(access_imports)]),
+        "linechart_access_gdp": (lambda: legacy_linechart_access_gdp(kenya), lambda: arrow_linechart_access_gdp(kenya)),
+    }
+
+def hand_off(frames):
+    # What st.altair_chart does with the data of every layer: serialize it to Arrow IPC
+    return [convert_anything_to_arrow_bytes(frame) for frame in frames]
+
+def allocated(function):
+    # Peak of the Python and NumPy allocations (the pandas copies); the Polars buffers that back the
+    # Arrow tables are shared, not copied, and aren't traced
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, result
+
+def run():
+    _, data, _ = load_data(CSV)
+    results = {}
+    for view, (legacy, arrow) in views(data).items():
+        for method, frames in [("pandas", legacy), ("arrow", arrow)]:
+            results[f"charts/{view} ({method})"] = measure(lambda: hand_off(frames()))
+            peak, payload = allocated(lambda: hand_off(frames()))
+            print(f"charts/{view} ({method}): allocated {peak / 1024:.1f} KiB, payload {sum(map(len, payload)) / 1024:.1f} KiB")
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
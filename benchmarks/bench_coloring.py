@@ -0,0 +1,93 @@
+import copy
+
+import matplotlib
+import matplotlib.colors as mcolors
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from benchmarks.common import CSV, measure, report
+from coloring import colorize
+from indexes import build_year_index
+from preprocessing import load_data
+
+
+# Per-feature loops used by the maps before the lookup tables
+def legacy_assign_color(geojson, min_rate, max_rate, colormap_name, variable, missing_color=[105, 105, 105]):
+    colormap = matplotlib.colormaps.get_cmap(colormap_name)
+    normalize = mcolors.Normalize(vmin=min_rate, vmax=max_rate)
+    for feature in geojson["features"]:
+        rate = feature["properties"].get(variable)
+        if rate is None or pd.isnull(rate):
+            feature["properties"]["fill_color"] = missing_color
+        else:
+            color = colormap(normalize(rate))
+            feature["properties"]["fill_color"] = [int(255 * c) for c in color[:3]]
+    return geojson
+
+def legacy_assign_color_imports(geojson, min_rate, max_rate, colormap_name='RdBu', missing_color=[105, 105, 105]):
+    norm = mcolors.TwoSlopeNorm(vmin=min_rate, vcenter=0, vmax=max_rate)
+    colormap = matplotlib.colormaps.get_cmap(colormap_name)
+    for feature in geojson["features"]:
+        rate = feature["properties"].get("energy_imports", None)
+        if rate is None or pd.isnull(rate):
+            feature["properties"]["fill_color"] = missing_color
+        else:
+            color = colormap(norm(rate))
+            feature["properties"]["fill_color"] = [int(255 * c) for c in color[:3]]
+    return geojson
+
+
+def features_for_year(frame, codes, variable):
+    # GeoJSON-like features holding the rounded values, as merge_data_* writes them
+    values = dict(frame.select("Country Code", variable).drop_nulls().iter_rows())
+    return {"features": [
+        {"id": code, "properties": {variable: round(float(values[code]), 2) if code in values else None}}
+        for code in codes
+    ]}
+
+def run():
+    _, data, _ = load_data(CSV)
+    data = data.with_columns((pl.col("urban_rate") - pl.col("rural_rate")).alias("disparity"))
+    year_index = build_year_index(data)
+
+    # Every country code, plus a few features without data
+    codes = sorted(data.get_column("Country Code").unique().to_list()) + ["ATA", "-99", "CS-KM"]
+
+    min_imports = data.filter(pl.col("year").is_between(1990, 2014)).get_column("energy_imports").min()
+    max_imports = data.filter(pl.col("year").is_between(1990, 2014)).get_column("energy_imports").max()
+    maps = [
+        ("total_rate", "Reds", 0, 100, None),
+        ("disparity", "Blues", 0, 100, None),
+        ("oil_gas_coal", "Greens", 0, 100, None),
+        ("energy_imports", "RdBu", min_imports, max_imports, 0),
+    ]
+
+    results = {}
+    for variable, colormap_name, vmin, vmax, vcenter in maps:
+        for year in range(1960, 2023):
+            geojson = features_for_year(year_index[year], codes, variable)
+            rates = np.array([f["properties"][variable] for f in geojson["features"]], dtype=float)
+
+            # The lookup table must give exactly the colors of the per-feature loop
+            if vcenter is None:
+                expected = legacy_assign_color(copy.deepcopy(geojson), vmin, vmax, colormap_name, variable)
+            else:
+                expected = legacy_assign_color_imports(copy.deepcopy(geojson), vmin, vmax, colormap_name)
+            colors = colorize(rates, colormap_name, vmin, vmax, vcenter).tolist()
+            assert colors == [f["properties"]["fill_color"] for f in expected["features"]], (variable, year)
+
+        # Time one year: per-feature loop against one lookup on the whole column
+        geojson = features_for_year(year_index[2000], codes, variable)
+        rates = np.array([f["properties"][variable] for f in geojson["features"]], dtype=float)
+        if vcenter is None:
+            legacy = lambda: legacy_assign_color(geojson, vmin, vmax, colormap_name, variable)
+        else:
+            legacy = lambda: legacy_assign_color_imports(geojson, vmin, vmax, colormap_name)
+        results[f"coloring/{variable}/per-feature loop"] = measure(legacy)
+        results[f"coloring/{variable}/lookup table"] = measure(lambda: colorize(rates, colormap_name, vmin, vmax, vcenter))
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
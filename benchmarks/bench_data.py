@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import polars as pl
+import streamlit as st
+
+from benchmarks.common import CSV, measure, report
+from indexes import build_year_index
+from preprocessing import CHANGELOG_FILE, SNAPSHOT_DIR, build_data, load_data
+from shared import freeze
+
+
+def year_filters(continents=("Africa",)):
+    # Filter of every view that shows one year, as the chart functions write it (on the rows of the year)
+    return {
+        "scatterplot_urban_rural": lambda rows: rows.filter(
+            pl.col("urban_rate").is_not_null()
+        ).select(["Country Name", "Continent", "urban_rate", "rural_rate"]),
+        "scatterplot_access_gdp": lambda rows: rows.filter(
+            pl.col("total_rate").is_not_null() &
+            pl.col("GDP").is_not_null() &
+            (pl.col("Country Name") != "World") &
+            pl.col("Continent").is_in(continents)
+        ).select(["Country Name", "total_rate", "Continent", "GDP"]),
+        "scatterplot_access_imports": lambda rows: rows.filter(
+            pl.col("total_rate").is_not_null() &
+            pl.col("energy_imports").is_not_null() &
+            (pl.col("Country Name") != "World") &
+            pl.col("Continent").is_in(continents)
+        ).select(["Country Name", "total_rate", "Continent", "energy_imports"]),
+    }
+
+def revised_export(text, countries=("Kenya", "Italy", "Brazil"), series="NY.GDP.PCAP.KD"):
+    # The CSV as a new export that revises one series of a few countries (the value of the last but one year)
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        if line.split(",", 1)[0] in countries and f",{series}," in line:
+            cells = line.split(",")
+            cells[-2] = "12345"
+            lines[i] = ",".join(cells)
+    return "\n".join(lines)
+
+def updated_export(text, date="12/31/2099"):
+    # The same CSV exported again: only the date of its "Last Updated" footer changes
+    return re.sub(r"Last Updated: *[^,\r\n]+", f"Last Updated: {date}", text)
+
+def check_refresh(csv, text, revision):
+    # The frames of the snapshot refreshed from the export text to its revision are those of a full build
+    with open(csv, "w", encoding="utf-8") as f:
+        f.write(text)
+    load_data(csv)
+    with open(csv, "w", encoding="utf-8") as f:
+        f.write(revision)
+    refreshed = load_data(csv)
+    with open(os.path.join(os.path.dirname(csv), SNAPSHOT_DIR, CHANGELOG_FILE), encoding="utf-8") as f:
+        assert json.loads(f.readlines()[-1])["refresh"] == "incremental"
+    assert all(a.equals(b) for a, b in zip(refreshed, build_data(csv)))
+
+def run():
+    results = {}
+
+    # A copy of the CSV in a temporary folder, so that its snapshot can be removed between cold loads
+    with tempfile.TemporaryDirectory() as folder:
+        csv = shutil.copy(CSV, folder)
+
+        def cold():
+            shutil.rmtree(os.path.join(folder, SNAPSHOT_DIR), ignore_errors=True)
+            return load_data(csv)
+
+        # get_data as the app defines it: st.cache_resource around the read-only load_data
+        get_data = st.cache_resource(lambda url: freeze(load_data(url)))
+        results["data/get_data cold (build and write the snapshot)"] = measure(cold, repeat=3, number=1)
+        results["data/get_data warm (memory-mapped snapshot)"] = measure(lambda: load_data(csv))
+
+        # New exports, one after the other: each one refreshes the snapshot of the previous one
+        with open(csv, encoding="utf-8") as f:
+            exports = [f.read()]
+        exports.append(revised_export(exports[0]))
+        for revision in [exports[1], revised_export(exports[0], countries=("World",)), updated_export(exports[0])]:
+            check_refresh(csv, exports[0], revision)
+
+        def new_export():
+            exports.reverse()
+            with open(csv, "w", encoding="utf-8") as f:
+                f.write(exports[0])
+            return load_data(csv)
+
+        results["data/get_data new export (incremental refresh)"] = measure(new_export, repeat=5, number=1)
+        get_data.clear()
+        get_data(csv)
+        results["data/get_data cached (st.cache_resource hit)"] = measure(lambda: get_data(csv))
+
+    world_data, data, _ = load_data(CSV)
+    year_index = build_year_index(data)
+    for view, year_filter in year_filters().items():
+        results[f"data/{view} year filter (scan)"] = measure(
+            lambda: year_filter(data.filter(pl.col("year") == 2000))
+        )
+        results[f"data/{view} year filter (index)"] = measure(lambda: year_filter(year_index[2000]))
+
+    # Views of World over a range of years
+    results["data/linechart_world year range"] = measure(
+        lambda: world_data.filter(pl.col("year").is_between(1998, 2022))
+    )
+    results["data/energy_trend_chart year range"] = measure(
+        lambda: world_data.filter(pl.col("year").is_between(1971, 2015)).select(
+            ["year", "oil_gas_coal", "nuclear", "hydroelectric", "renewable"]
+        )
+    )
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
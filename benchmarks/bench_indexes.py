@@ -0,0 +1,66 @@
+import polars as pl
+
+from benchmarks.common import CSV, measure, report
+from indexes import (
+    available_countries, available_years, build_availability_index, build_country_index,
+    build_year_index, query_countries
+)
+from preprocessing import INDICATORS, load_data
+
+
+def run():
+    _, data, _ = load_data(CSV)
+    year_index = build_year_index(data)
+    country_index = build_country_index(data)
+    countries = ["Italy", "China", "Algeria", "Argentina", "Indonesia"]
+    indicators = list(INDICATORS.values())
+    availability = build_availability_index(data, indicators)
+    pair = pl.col("GDP").is_not_null() & pl.col("total_rate").is_not_null()
+
+    # Same rows from the index and from a scan of the whole frame
+    assert year_index[2000].equals(data.filter(pl.col("year") == 2000))
+    assert query_countries(country_index, countries, (1990, 2022)).sort("Country Name", "year").equals(
+        data.filter(pl.col("Country Name").is_in(countries) & pl.col("year").is_between(1990, 2022)).sort("Country Name", "year")
+    )
+    assert list(available_countries(availability, ["GDP", "total_rate"])) == sorted(
+        data.filter(pair).get_column("Country Name").unique().cast(pl.String).to_list()
+    )
+    assert available_years(availability, ["GDP", "total_rate"]) == tuple(
+        data.filter(pair).select(pl.col("year").min().alias("first"), pl.col("year").max().alias("last")).row(0)
+    )
+
+    return {
+        "indexes/build year index": measure(lambda: build_year_index(data)),
+        "indexes/build country index": measure(lambda: build_country_index(data)),
+        "indexes/one year (filter)": measure(lambda: data.filter(pl.col("year") == 2000)),
+        "indexes/one year (index)": measure(lambda: year_index[2000]),
+        "indexes/one country, one year (filter)": measure(
+            lambda: data.filter((pl.col("Country Name") == "Kenya") & (pl.col("year") == 1990))
+        ),
+        "indexes/one country, one year (index)": measure(
+            lambda: query_countries(country_index, ["Kenya"], (1990, 1990))
+        ),
+        "indexes/5 countries, 1990-2022 (filter)": measure(
+            lambda: data.filter(pl.col("Country Name").is_in(countries) & pl.col("year").is_between(1990, 2022))
+        ),
+        "indexes/5 countries, 1990-2022 (index)": measure(
+            lambda: query_countries(country_index, countries, (1990, 2022))
+        ),
+        "indexes/build availability index": measure(lambda: build_availability_index(data, indicators)),
+        "indexes/countries with GDP and access (filter)": measure(
+            lambda: sorted(data.filter(pair).get_column("Country Name").unique().to_list())
+        ),
+        "indexes/countries with GDP and access (index)": measure(
+            lambda: available_countries(availability, ["GDP", "total_rate"])
+        ),
+        "indexes/years with GDP and access (filter)": measure(
+            lambda: data.filter(pair).select(pl.col("year").min().alias("first"), pl.col("year").max().alias("last")).row(0)
+        ),
+        "indexes/years with GDP and access (index)": measure(
+            lambda: available_years(availability, ["GDP", "total_rate"])
+        ),
+    }
+
+
+if __name__ == "__main__":
+    report(run())
@@ -0,0 +1,91 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+from benchmarks.common import CSV, ROOT, report
+from preprocessing import INDICATORS, NULL_VALUES, build_data, read_series
+
+
+# Size of the full WDI bulk export
+FULL_SERIES = 1500
+FULL_ECONOMIES = 266
+YEARS = range(1960, 2024)
+
+
+def legacy_read_series(url):
+    # Eager read of the whole CSV, then the rows of the dashboard's indicators
+    return pl.read_csv(url, null_values=NULL_VALUES).filter(pl.col("Series Code").is_in(list(INDICATORS)))
+
+def synthetic_wdi(path, series=FULL_SERIES, economies=FULL_ECONOMIES, seed=0):
+    # DataBank-like export at full scale: the dashboard's indicators among synthetic ones, ".." for missing
+    # values, then the blank rows and the footer notes
+    rng = np.random.default_rng(seed)
+    real = pl.read_csv(CSV, columns=["Country Name", "Country Code"]).drop_nulls().unique(maintain_order=True)
+    names = real.get_column("Country Name").to_list()
+    codes = real.get_column("Country Code").to_list()
+    names += [f"Synthetic economy {i}" for i in range(len(names), economies)]
+    codes += [f"X{i:02d}" for i in range(len(codes), economies)]
+    series_names = [f"Synthetic series {i} (% of total)" for i in range(series)]
+    series_codes = list(INDICATORS) + [f"SYN.{i:04d}" for i in range(len(INDICATORS), series)]
+
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (name, code) in enumerate(zip(names[:economies], codes[:economies])):
+            values = np.round(rng.uniform(0, 100, size=(series, len(YEARS))), 4)
+            values[rng.random(values.shape) < 0.4] = np.nan
+            chunk = pl.DataFrame({
+                "Country Name": [name] * series,
+                "Country Code": [code] * series,
+                "Series Name": series_names,
+                "Series Code": series_codes,
+                **{f"{year} [YR{year}]": values[:, j] for j, year in enumerate(YEARS)},
+            }).with_columns(pl.col(pl.Float64).fill_nan(None))
+            chunk.write_csv(f, include_header=i == 0, null_value="..")
+        blank = "," * (3 + len(YEARS))
+        f.write(f"{blank}\n{blank}\nData from database: World Development Indicators{blank}\nLast Updated: 01/28/2025{blank}\n")
+
+def full_scale_csv():
+    # Generated once and kept in the temporary folder
+    path = os.path.join(tempfile.gettempdir(), f"WDICSV-synthetic-{FULL_SERIES}x{FULL_ECONOMIES}.csv")
+    if not os.path.exists(path):
+        synthetic_wdi(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+    return path
+
+def ingest(method, url):
+    # One ingestion in this process: time and peak memory
+    functions = {"legacy": legacy_read_series, "lazy": read_series, "build": build_data}
+    start = time.perf_counter()
+    functions[method](url)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+def spawn(method, url):
+    # Each ingestion in a fresh interpreter, so that the peak memory is its own
+    command = [sys.executable, "-m", "benchmarks.bench_ingestion", "--child", method, url]
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+def run(repeat=3):
+    results = {}
+    for label, url in [("WDICSV.csv", CSV), (f"{FULL_SERIES} series x {FULL_ECONOMIES} economies", full_scale_csv())]:
+        for method in ["legacy", "lazy", "build"]:
+            runs = [spawn(method, url) for _ in range(repeat)]
+            results[f"{label}: {method}"] = min(r["seconds"] for r in runs)
+            # Peak memory (RSS) also counts the pages of the memory-mapped CSV
+            print(f"{label}: {method} peak memory {max(r['max_rss'] for r in runs) / 2**20:.0f} MiB")
+    return results
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv[1:]:
+        method, url = sys.argv[sys.argv.index("--child") + 1:][:2]
+        print(json.dumps(ingest(method, url)))
+    else:
+        report(run())
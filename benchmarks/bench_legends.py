@@ -0,0 +1,106 @@
+import io
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.colorbar as cbar
+import matplotlib.colors as mcolors
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+
+from benchmarks.common import measure, report
+from legends import create_legend, create_legend_imports
+
+
+# Matplotlib legends used by the maps before the HTML legends
+def legacy_create_legend(colormap_name, min_rate, max_rate, text, missing_color=[105, 105, 105]):
+    fig, ax = plt.subplots(figsize=(0.7, 4))
+    fig.subplots_adjust(left=0.5, right=0.8, top=0.9, bottom=0.1)
+    fig.patch.set_facecolor('none')
+    ax.set_facecolor('none')
+    ax.text(0, 110, text, fontsize=10, color='white', va='center')
+    colormap = matplotlib.colormaps.get_cmap(colormap_name)
+    norm = Normalize(vmin=min_rate, vmax=max_rate)
+    cbar_instance = cbar.ColorbarBase(ax, cmap=colormap, norm=norm, orientation='vertical')
+    cbar_instance.ax.tick_params(colors='white')
+    ax_missing = fig.add_axes([0.5, 0.005, 0.3, 0.05])
+    ax_missing.set_xticks([])
+    ax_missing.set_yticks([])
+    ax_missing.set_xlim(0, 1)
+    ax_missing.set_ylim(0, 1)
+    ax_missing.add_patch(plt.Rectangle((0, 0), 1, 1, color=[c / 255 for c in missing_color]))
+    ax_text = fig.add_axes([0.9, 0.005, 0.3, 0.05])
+    ax_text.set_xticks([])
+    ax_text.set_yticks([])
+    ax_text.set_xlim(0, 1)
+    ax_text.set_ylim(0, 1)
+    ax_text.text(0, 0.5, "No Data", fontsize=10, color='white', va='center')
+    ax_text.set_facecolor('black')
+    return fig
+
+def legacy_create_legend_imports(colormap_name, min_rate, max_rate, missing_color=[105, 105, 105]):
+    fig, ax = plt.subplots(figsize=(4, 60))
+    fig.patch.set_facecolor('none')
+    ax.set_facecolor('none')
+    norm = mcolors.TwoSlopeNorm(vmin=min_rate, vcenter=0, vmax=max_rate)
+    cmap = plt.get_cmap(colormap_name)
+    sm = ScalarMappable(norm=norm, cmap=cmap)
+    sm.set_array([])
+    cbar = fig.colorbar(sm, cax=ax, orientation='vertical')
+    tick_values = np.linspace(min_rate, max_rate, num=6)
+    if 0 not in tick_values:
+        tick_values = np.unique(np.append(tick_values, 0))
+    cbar.set_ticks(tick_values)
+    cbar.set_ticklabels([f"{v:.2f}" for v in tick_values])
+    cbar.ax.text(0.5, 1.05, "Energy \n Imports (%)", transform=cbar.ax.transAxes,
+                 ha='center', va='bottom', color='white', fontsize=150)
+    cbar.ax.tick_params(colors='white', labelsize=120)
+    cbar.outline.set_edgecolor('white')
+    cbar.ax.yaxis.set_tick_params(color='white')
+    ax_inset = fig.add_axes([0.15, 0.01, 0.8, 0.05], facecolor='black')
+    ax_inset.imshow([[missing_color]], aspect='auto')
+    ax_inset.axis('off')
+    ax_inset.text(0.8, 0.05, 'Missing', va='center', fontsize=120, color='white')
+    return fig
+
+def pyplot(fig):
+    # What st.pyplot does with a figure: rasterize it to PNG
+    image = io.BytesIO()
+    fig.savefig(image, bbox_inches="tight", dpi=200, format="png")
+    plt.close(fig)
+    return image.getvalue()
+
+
+def run():
+    min_imports, max_imports = -1210.24, 98.6
+    results = {
+        "legends/create_legend (matplotlib + st.pyplot)": measure(
+            lambda: pyplot(legacy_create_legend("Reds", 0, 100, "Access to \nelectricity (%)")), repeat=3, number=3
+        ),
+        "legends/create_legend_imports (matplotlib + st.pyplot)": measure(
+            lambda: pyplot(legacy_create_legend_imports("RdBu", min_imports, max_imports)), repeat=3, number=1
+        ),
+    }
+
+    def cold(legend, *args):
+        legend.cache_clear()
+        return legend(*args)
+
+    results["legends/create_legend (HTML, first call)"] = measure(
+        lambda: cold(create_legend, "Reds", 0, 100, "Access to \nelectricity (%)")
+    )
+    results["legends/create_legend (HTML, cached)"] = measure(
+        lambda: create_legend("Reds", 0, 100, "Access to \nelectricity (%)")
+    )
+    results["legends/create_legend_imports (HTML, first call)"] = measure(
+        lambda: cold(create_legend_imports, "RdBu", min_imports, max_imports)
+    )
+    results["legends/create_legend_imports (HTML, cached)"] = measure(
+        lambda: create_legend_imports("RdBu", min_imports, max_imports)
+    )
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
@@ -0,0 +1,86 @@
+import json
+import pickle
+
+import pandas as pd
+import polars as pl
+import pydeck as pdk
+
+from benchmarks.bench_coloring import legacy_assign_color
+from benchmarks.common import CSV, measure, report
+from geometry import load_geometry
+from indexes import build_year_index
+from maps import build_map_frames, map_deck
+from preprocessing import load_data
+
+
+# Map pipeline before the attribute tables: a pickled copy of the GeoJSON modified in place
+def legacy_merge_data_access(data, geojson):
+    data_dict = data.set_index('Country Code')['total_rate'].to_dict()
+    for feature in geojson['features']:
+        total_rate = data_dict.get(feature['id'], None)
+        if pd.notnull(total_rate):
+            feature["properties"]["total_rate"] = round(float(total_rate), 2)
+        else:
+            feature["properties"]["total_rate"] = None
+    return geojson
+
+def legacy_map_access(filtered_data, geojson_pickle):
+    # st.cache_data returned an unpickled copy of the GeoJSON on every call
+    geojson = pickle.loads(geojson_pickle)
+    merged_geojson = legacy_merge_data_access(filtered_data.to_pandas(), geojson)
+    merged_geojson = legacy_assign_color(merged_geojson, 0, 100, "Reds", "total_rate")
+    geojson_layer = pdk.Layer(
+        "GeoJsonLayer",
+        data=merged_geojson,
+        pickable=True,
+        filled=True,
+        stroked=True,
+        get_fill_color="properties.fill_color",
+        get_line_color=[0, 0, 0],
+        line_width_min_pixels=1
+    )
+    view_state = pdk.ViewState(latitude=35, longitude=15, zoom=0.4, pitch=0)
+    deck = pdk.Deck(layers=[geojson_layer], initial_view_state=view_state, tooltip={"html": "{total_rate}"})
+    return deck.to_json()
+
+# The four maps of the app: columns (the first is colored), colormap, bounds and center of the colors
+MAPS = {
+    "map_access": (["total_rate"], "Reds", 0, 100, None),
+    "map_disparity": (["disparity", "urban_rate", "rural_rate"], "Blues", 0, 100, None),
+    "map_imports": (["energy_imports"], "RdBu", -1942.0, 100, 0),
+    "map_energy_sources": (["oil_gas_coal"], "Greens", 0, 100, None),
+}
+
+
+def run():
+    _, data, _ = load_data(CSV)
+    filtered_data = (
+        build_year_index(data)[2000]
+            .select(["Country Name", "Country Code", "total_rate"])
+            .drop_nulls(["total_rate"])
+    )
+    geojson_pickle = pickle.dumps(json.loads(json.dumps(load_geometry(), default=dict)))
+
+    results = {
+        "maps/map_access rerun (pickled GeoJSON copy)": measure(lambda: legacy_map_access(filtered_data, geojson_pickle), repeat=3),
+    }
+
+    # Every map as the app draws it: the frames of every year (built once; a slider move is then a lookup), and
+    # a rerun from the frames
+    map_data = data.with_columns((pl.col("urban_rate") - pl.col("rural_rate")).alias("disparity"))
+    for name, (columns, colormap_name, vmin, vmax, vcenter) in MAPS.items():
+        results[f"maps/{name} frames for every year"] = measure(
+            lambda: build_map_frames(map_data, columns, colormap_name, vmin, vmax, vcenter), repeat=3
+        )
+        frames = build_map_frames(map_data, columns, colormap_name, vmin, vmax, vcenter)
+        results[f"maps/{name} rerun (precomputed frames)"] = measure(
+            lambda: map_deck(*frames[2000], tooltip={"html": f"{{{columns[0]}}}"}).to_json()
+        )
+        if name == "map_access":
+            print(f"map_access spec: {len(legacy_map_access(filtered_data, geojson_pickle)):,} bytes before, "
+                  f"{len(map_deck(*frames[2000], tooltip={'html': '{total_rate}'}).to_json()):,} bytes after")
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
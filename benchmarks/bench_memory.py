@@ -0,0 +1,56 @@
+import gc
+import os
+import pickle
+
+import streamlit as st
+
+from benchmarks.common import CSV, measure, report
+from preprocessing import load_data
+from shared import freeze
+
+
+def rss():
+    # Resident memory of the process in bytes (Linux only, None elsewhere)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+def session_overhead(get_data, sessions):
+    # Memory held by as many concurrent sessions, each keeping the result of its rerun
+    get_data(CSV)
+    gc.collect()
+    before = rss()
+    held = [get_data(CSV) for _ in range(sessions)]
+    gc.collect()
+    after = rss()
+    del held
+    if before is None or after is None:
+        return None
+    return (after - before) / sessions
+
+def run(sessions=50):
+    # get_data before (st.cache_data: every hit unpickles a copy for the session) and after (st.cache_resource:
+    # every session reads the same read-only frames)
+    copied = st.cache_data(lambda url: load_data(url))
+    shared = st.cache_resource(lambda url: freeze(load_data(url)))
+    copied.clear()
+    shared.clear()
+
+    results = {
+        "memory/get_data hit (st.cache_data copy)": measure(lambda: copied(CSV)),
+        "memory/get_data hit (st.cache_resource, shared)": measure(lambda: shared(CSV)),
+    }
+
+    size = len(pickle.dumps(load_data(CSV)))
+    print(f"get_data: {size:,} bytes unpickled by every hit before, none after")
+    for name, get_data in [("before", copied), ("after", shared)]:
+        overhead = session_overhead(get_data, sessions)
+        if overhead is not None:
+            print(f"Memory per session ({sessions} sessions) {name}: {overhead / 1024:,.1f} KiB")
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
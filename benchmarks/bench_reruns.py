@@ -0,0 +1,83 @@
+import functools
+import os
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.common import ROOT, report
+
+
+APP = os.path.join(ROOT, "app.py")
+
+PAGES = [
+    "Access to electricity",
+    "Access to electricity in urban and rural areas",
+    "Access to electricity vs GDP",
+    "Access to electricity vs energy imports",
+    "Overview to energy sources around the world",
+]
+
+
+def timed_fragments(timings):
+    # st.fragment that also records how long each chart function takes
+    fragment = st.fragment
+
+    def timed_fragment(function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings[function.__name__] = time.perf_counter() - start
+        return fragment(timed)
+    return timed_fragment
+
+def moved(slider):
+    # Another valid value for the slider (a range slider moves its lower end)
+    if isinstance(slider.value, tuple):
+        low, high = slider.value
+        return (low + 1, high) if low + 1 < high else (low - 1, high)
+    return slider.value - 1 if slider.value > slider.min else slider.value + 1
+
+def page_reruns(page, timings, repeat=3):
+    # Move every slider of the page: AppTest reruns the whole script, as Streamlit does without
+    # fragments, while a fragment rerun only costs its chart function (recorded in timings)
+    app = AppTest.from_file(APP, default_timeout=120)
+    app.session_state["page"] = page
+    app.run()
+
+    page_times = []
+    fragment_times = {}
+    for index in range(len(app.slider)):
+        for _ in range(repeat):
+            app.slider[index].set_value(moved(app.slider[index]))
+            timings.clear()
+            start = time.perf_counter()
+            app.run()
+            page_times.append(time.perf_counter() - start)
+            for name, seconds in timings.items():
+                fragment_times[name] = min(seconds, fragment_times.get(name, seconds))
+    if app.exception:
+        raise RuntimeError(f"{page}: {app.exception[0].value}")
+    return min(page_times), fragment_times
+
+def run(repeat=3):
+    results = {}
+    timings = {}
+    fragment = st.fragment
+    st.fragment = timed_fragments(timings)
+    try:
+        for page in PAGES:
+            page_time, fragment_times = page_reruns(page, timings, repeat)
+            results[f"{page}: page rerun"] = page_time
+            for name, seconds in fragment_times.items():
+                results[f"{page}: {name} rerun"] = seconds
+    finally:
+        st.fragment = fragment
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
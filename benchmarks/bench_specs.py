@@ -0,0 +1,38 @@
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_reruns import APP, PAGES, timed_fragments
+from benchmarks.common import report
+
+
+def page_renders(page, timings, repeat=5):
+    # Render the page repeat times with its default widgets: each chart function builds its data and its
+    # Altair (or pydeck) spec, and Streamlit serializes it
+    app = AppTest.from_file(APP, default_timeout=120)
+    app.session_state["page"] = page
+    chart_times = {}
+    for _ in range(repeat):
+        timings.clear()
+        app.run()
+        for name, seconds in timings.items():
+            chart_times[name] = min(seconds, chart_times.get(name, seconds))
+    if app.exception:
+        raise RuntimeError(f"{page}: {app.exception[0].value}")
+    return chart_times
+
+def run(repeat=5):
+    results = {}
+    timings = {}
+    fragment = st.fragment
+    st.fragment = timed_fragments(timings)
+    try:
+        for page in PAGES + ["Data coverage"]:
+            for name, seconds in page_renders(page, timings, repeat).items():
+                results[f"specs/{name}"] = seconds
+    finally:
+        st.fragment = fragment
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
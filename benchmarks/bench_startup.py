@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import CSV, ROOT, report
+
+
+APP = os.path.join(ROOT, "app.py")
+
+# Modules that should only be imported by the pages that need them
+HEAVY_MODULES = ["altair", "pandas", "pydeck", "matplotlib", "PIL", "numpy", "pycountry", "pycountry_convert", "requests"]
+
+
+def cold_start(page=None):
+    # Run in a fresh interpreter: import Streamlit, then render the page once, headless
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+
+    app = AppTest.from_file(APP, default_timeout=120)
+    if page is not None:
+        app.session_state["page"] = page
+    app.run()
+    rendered = time.perf_counter()
+
+    if app.exception:
+        raise RuntimeError(f"{page}: {app.exception[0].value}")
+    return {
+        "page": app.radio(key="page").value,
+        "pages": list(app.radio(key="page").options),
+        "import": imported - start,
+        "first_render": rendered - imported,
+        "modules": [module for module in HEAVY_MODULES if module in sys.modules],
+    }
+
+def spawn(page=None):
+    # Cold start of a page in a subprocess, so that no module or cache is shared between runs
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"]
+    if page is not None:
+        command.append(page)
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+def run(repeat=3):
+    from geometry import load_geometry
+    from preprocessing import load_data
+
+    # Build the snapshot and the geometry cache first: the benchmark measures the app, not the build step
+    load_data(CSV)
+    load_geometry(os.path.join(ROOT, "countries.geo.json"))
+
+    # The default page tells which pages there are
+    runs = {}
+    first = [spawn() for _ in range(repeat)]
+    runs[first[0]["page"]] = first
+    for page in first[0]["pages"][1:]:
+        runs[page] = [spawn(page) for _ in range(repeat)]
+
+    results = {}
+    for page, page_runs in runs.items():
+        results[f"{page}: import"] = min(r["import"] for r in page_runs)
+        results[f"{page}: first render"] = min(r["first_render"] for r in page_runs)
+        print(f"{page}: {', '.join(page_runs[0]['modules']) or 'no heavy modules'}")
+    return results
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv[1:]:
+        # One cold start, printed as JSON for the parent process
+        pages = sys.argv[sys.argv.index("--child") + 1:]
+        print(json.dumps(cold_start(pages[0] if pages else None)))
+    else:
+        report(run())
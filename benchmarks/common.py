@@ -0,0 +1,21 @@
+import os
+import timeit
+
+
+# Benchmarks are run from the repository root, e.g. python -m benchmarks.bench_coloring
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = os.path.join(ROOT, "WDICSV.csv")
+
+
+def measure(function, repeat=5, number=None):
+    # Best time per call (in seconds), choosing the number of calls like timeit does
+    timer = timeit.Timer(function)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def report(results):
+    # Print one line per benchmark, in milliseconds
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        print(f"{name:<{width}}  {seconds * 1e3:12.4f} ms")
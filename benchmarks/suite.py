@@ -0,0 +1,94 @@
+import argparse
+import collections
+import importlib
+import json
+import os
+import statistics
+import sys
+
+from benchmarks.common import ROOT
+
+
+# Benchmarks of the suite, headless and without network; --all adds the ones that spawn interpreters, load a
+# local server or generate the full-scale CSV
+SUITE = ["bench_data", "bench_indexes", "bench_coloring", "bench_maps", "bench_legends", "bench_charts", "bench_specs",
+         "bench_memory"]
+SLOW = ["bench_reruns", "bench_startup", "bench_ingestion", "bench_api"]
+
+# Wall-clock timings of whole app runs (AppTest), interpreters and servers: they vary much more from one run to
+# the next than the timeit benchmarks, so they are gated with --wall-threshold and --wall-noise
+WALL_CLOCK = ["bench_specs"] + SLOW
+
+# Timings depend on the machine, so the baseline isn't committed
+BASELINE_PATH = os.path.join(ROOT, ".benchmarks", "baseline.json")
+
+
+def run_suite(modules, repeat=1):
+    # Median of repeat runs of every benchmark (one slow run doesn't move it), and the names of the wall-clock ones
+    runs = collections.defaultdict(list)
+    wall_clock = set()
+    for i in range(repeat):
+        for module in modules:
+            print(f"Running {module} ({i + 1}/{repeat})...", file=sys.stderr)
+            for name, seconds in importlib.import_module(f"benchmarks.{module}").run().items():
+                runs[name].append(seconds)
+                if module in WALL_CLOCK:
+                    wall_clock.add(name)
+    return {name: statistics.median(times) for name, times in runs.items()}, wall_clock
+
+def compare(results, baseline, limits, wall_clock=()):
+    # Benchmarks slower than the baseline by more than a threshold (a fraction) and by more than a noise floor
+    # (seconds): limits are (threshold, noise) of the timeit benchmarks and of the wall-clock ones
+    regressions = {}
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        if name not in baseline:
+            print(f"{name:<{width}}  {seconds * 1e3:12.4f} ms  (new)")
+            continue
+        threshold, noise = limits[name in wall_clock]
+        change = seconds / baseline[name] - 1
+        regressed = change > threshold and seconds - baseline[name] > noise
+        if regressed:
+            regressions[name] = change
+        print(f"{name:<{width}}  {seconds * 1e3:12.4f} ms  {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def save(results, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+# python -m benchmarks.suite [--save] [--repeat 3] [--threshold 0.5] [--only bench_maps ...]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmarks and compare them with the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON file of the baseline timings")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="fail when a benchmark is slower than the baseline by more than this fraction")
+    parser.add_argument("--noise", type=float, default=2,
+                        help="ignore slowdowns smaller than this (in milliseconds)")
+    parser.add_argument("--wall-threshold", type=float, default=1.0,
+                        help="threshold of the wall-clock benchmarks (app runs, interpreters, servers)")
+    parser.add_argument("--wall-noise", type=float, default=20,
+                        help="noise floor of the wall-clock benchmarks (in milliseconds)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of every benchmark, compared (and saved) by their median")
+    parser.add_argument("--only", nargs="+", choices=SUITE + SLOW, help="run only these benchmarks")
+    parser.add_argument("--all", action="store_true", help=f"also run {', '.join(SLOW)}")
+    args = parser.parse_args()
+
+    results, wall_clock = run_suite(args.only or SUITE + (SLOW if args.all else []), args.repeat)
+    if args.save or not os.path.exists(args.baseline):
+        save(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        sys.exit(0)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    limits = {False: (args.threshold, args.noise / 1e3), True: (args.wall_threshold, args.wall_noise / 1e3)}
+    regressions = compare(results, baseline, limits, wall_clock)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%} "
+              f"({args.wall_threshold:.0%} for the wall-clock ones)", file=sys.stderr)
+        sys.exit(1)
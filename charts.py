@@ -0,0 +1,66 @@
+import polars as pl
+import pyarrow as pa
+import streamlit as st
+from streamlit.logger import get_logger
+
+from profiling import stage
+
+
+logger = get_logger(__name__)
+
+# Bytes of chart data sent by the last render of every chart
+PAYLOADS = {}
+
+# Last chart drawn by every chart function, kept only while a static export runs the app (export.py)
+RECORDED = None
+
+
+def chart_data(frame, columns=None):
+    # Arrow table of the frame for Altair: Streamlit serializes a pyarrow Table as it is, while any other
+    # frame is converted to pandas first. Only the given columns are kept (the ones the chart encodes), and
+    # Enums become plain strings, so that the payload doesn't carry every category of the column
+    if columns is not None:
+        frame = frame.select(columns)
+    return frame.with_columns(pl.col(pl.Enum).cast(pl.String)).to_arrow()
+
+def chart_datasets(chart):
+    # Arrow tables of the chart and of its layers, each one once (layers usually share the top-level data)
+    tables = {}
+    charts = [chart]
+    while charts:
+        chart = charts.pop()
+        data = getattr(chart, "data", None)
+        if isinstance(data, pa.Table):
+            tables[id(data)] = data
+        layers = getattr(chart, "layer", None)
+        if isinstance(layers, list):
+            charts.extend(layers)
+    return list(tables.values())
+
+def payload_bytes(table):
+    # Size of the Arrow IPC stream that Streamlit sends for the table, counted without writing it
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+def altair_chart(chart, name):
+    # Display the chart, recording and logging the bytes of its data
+    PAYLOADS[name] = sum(payload_bytes(table) for table in chart_datasets(chart))
+    logger.info("%s: %d bytes of chart data", name, PAYLOADS[name])
+    if RECORDED is not None:
+        RECORDED[name] = chart
+    with stage("serialize"):
+        st.altair_chart(chart, use_container_width=True)
+
+def stack(frame, value, by=None, normalize=False):
+    # Start and end of every value in its stack (by group, in the frame's order), as Vega-Lite would compute
+    # them in the browser; nulls count as 0 and normalized stacks go from 0 to 1
+    def per_stack(expression):
+        return expression if by is None else expression.over(by)
+
+    size = pl.col(value).fill_null(0)
+    if normalize:
+        size = size / size.sum()
+    end = per_stack(size.cum_sum())
+    return frame.with_columns((end - per_stack(size)).alias("start"), end.alias("end"))
@@ -0,0 +1,65 @@
+import functools
+
+import numpy as np
+
+
+# Color for countries without data
+MISSING_COLOR = (105, 105, 105)
+
+
+@functools.lru_cache(maxsize=None)
+def color_table(colormap_name, missing_color=MISSING_COLOR):
+    import matplotlib
+
+    # Get the colormap from matplotlib
+    colormap = matplotlib.colormaps.get_cmap(colormap_name)
+
+    # The N colors of the colormap, followed by the "under", "over" and missing colors
+    rgba = np.vstack([
+        colormap(np.arange(colormap.N)),
+        colormap.get_under(),
+        colormap.get_over(),
+    ])
+
+    # Convert to RGB in [0, 255], truncating like int(255 * c)
+    table = (255 * rgba[:, :3]).astype(np.uint8)
+    return np.vstack([table, np.array(missing_color, dtype=np.uint8)])
+
+def normalize(values, vmin, vmax, vcenter=None):
+    # Same arithmetic as matplotlib's Normalize and TwoSlopeNorm, on the whole array
+    if vcenter is not None:
+        if not vmin <= vcenter <= vmax:
+            raise ValueError("vmin, vcenter, vmax must increase monotonically")
+        return np.interp(values, [vmin, vcenter, vmax], [0, 0.5, 1], left=-np.inf, right=np.inf)
+    if vmin == vmax:
+        return np.zeros_like(values)
+    return (values - vmin) / (vmax - vmin)
+
+@functools.lru_cache(maxsize=64)
+def color_scale(colormap_name, vmin, vmax, vcenter=None, missing_color=MISSING_COLOR):
+    # Lookup table of the (colormap, norm) pair
+    table = color_table(colormap_name, missing_color)
+    n = len(table) - 3
+    under, over, missing = n, n + 1, n + 2
+
+    def scale(values):
+        values = np.asarray(values, dtype=float)
+        is_missing = np.isnan(values)
+
+        # Position of each value in the colormap, as matplotlib computes it
+        position = normalize(np.where(is_missing, vmin, values), vmin, vmax, vcenter) * n
+        position[position == n] = n - 1
+
+        # Index of each value in the lookup table
+        index = np.clip(position, -1, n).astype(np.intp)
+        index[position < 0] = under
+        index[position >= n] = over
+        index[is_missing] = missing
+        return table[index]
+
+    return scale
+
+def colorize(values, colormap_name, vmin, vmax, vcenter=None, missing_color=MISSING_COLOR):
+    # Map a whole column of values (NaN for missing data) to RGB colors
+    scale = color_scale(colormap_name, vmin, vmax, vcenter, tuple(missing_color))
+    return scale(values)
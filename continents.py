@@ -0,0 +1,49 @@
+import polars as pl
+
+
+# Country code -> continent table used by the preprocessing, shipped with the app
+CONTINENTS_PATH = "./continents.csv"
+
+# Manual assignments for the countries that pycountry_convert doesn't map (or that aren't in pycountry)
+OVERRIDES_PATH = "./continent_overrides.csv"
+
+# Continents that are shown as a single group
+CONTINENT_GROUPS = {"Asia": "Asia/Oceania", "Oceania": "Asia/Oceania"}
+
+CONTINENT = pl.Enum(["Africa", "Antarctica", "Asia/Oceania", "Europe", "North America", "South America", "World"])
+
+
+def build_continent_table(path=CONTINENTS_PATH, overrides_path=OVERRIDES_PATH):
+    import pycountry_convert as pc
+    import pycountry
+
+    # Continent of every ISO 3166 country, according to pycountry_convert
+    mapping = {}
+    for country in pycountry.countries:
+        try:
+            continent_code = pc.country_alpha2_to_continent_code(country.alpha_2)
+            mapping[country.alpha_3] = pc.convert_continent_code_to_continent_name(continent_code)
+        except KeyError:
+            mapping[country.alpha_3] = None
+
+    # Manual assignments take precedence
+    overrides = pl.read_csv(overrides_path)
+    mapping.update(zip(overrides.get_column("Country Code"), overrides.get_column("Continent")))
+
+    table = pl.DataFrame({
+        "Country Code": list(mapping.keys()),
+        "Continent": [CONTINENT_GROUPS.get(continent, continent) for continent in mapping.values()],
+    }, schema={"Country Code": pl.String, "Continent": CONTINENT}).sort("Country Code")
+
+    table.write_csv(path)
+    return table
+
+def load_continents(path=CONTINENTS_PATH):
+    # One row per country code, with the continent as an Enum (null if unknown)
+    return pl.read_csv(path, schema={"Country Code": pl.String, "Continent": CONTINENT})
+
+
+# Build step, only when pycountry or the overrides change: python continents.py
+if __name__ == "__main__":
+    table = build_continent_table()
+    print(f"{CONTINENTS_PATH} written ({table.height} countries)")
@@ -0,0 +1,302 @@
+import argparse
+import ast
+import datetime
+import glob
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from geometry import GEOJSON_PATH
+from preprocessing import CONTINENTS_PATH, file_hash
+
+
+# The app is run headless, from the repository root like streamlit run
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+CSV_PATH = "./WDICSV.csv"
+
+EXPORT_DIR = "./export"
+MANIFEST = "manifest.json"
+
+# Charts of the static export: their page, and the widgets (by key) whose every value is exported, one at a time
+# while the other widgets keep their default value (a multiselect with one option selected at a time, a tuple of
+# keys with every combination of their values); a chart without such widgets is exported as the page shows it.
+# Year ranges keep their default (every year with data)
+EXPORTS = {
+    "linechart_world": ("Access to electricity", {}),
+    "map_access": ("Access to electricity", {"year": "map_access_year"}),
+    "linechart_countries": ("Access to electricity", {"country": "selected_countries"}),
+    "continent_trend_chart": ("Access to electricity", {"indicator": "continent_trend_indicator"}),
+    "scatterplot_urban_rural": ("Access to electricity in urban and rural areas", {
+        "year": "scatterplot_urban_rural_year",
+        "country": "scatterplot_urban_rural_country",
+    }),
+    "map_disparity": ("Access to electricity in urban and rural areas", {"year": "map_disparity_year"}),
+    "linechart_access_gdp": ("Access to electricity vs GDP", {"country": "linechart_access_gdp_country"}),
+    "scatterplot_access_gdp": ("Access to electricity vs GDP", {
+        "year": "scatterplot_slider",
+        "continent": "selected_continents",
+    }),
+    "map_imports": ("Access to electricity vs energy imports", {"year": "map_imports_year"}),
+    "scatterplot_access_imports": ("Access to electricity vs energy imports", {
+        "year": "scatterplot_slider",
+        "continent": "selected_continents",
+    }),
+    "energy_trend_chart": ("Overview to energy sources around the world", {}),
+    "circle_chart": ("Overview to energy sources around the world", {
+        "country": "circle_chart_country",
+        "year": "circle_chart_year_slider",
+    }),
+    "stackedchart": ("Overview to energy sources around the world", {
+        "year": "stackedchart_year",
+        "country": "stackedchart_countries",
+    }),
+    "map_energy_sources": ("Overview to energy sources around the world", {
+        "source_year": ("map_energy_sources_source", "map_energy_sources_year"),
+    }),
+    "coverage_heatmap": ("Data coverage", {}),
+    "coverage_countries_heatmap": ("Data coverage", {"continent": "coverage_continent"}),
+}
+
+# Altair charts are saved as Vega-Lite JSON, standalone HTML or PNG; maps are always deck.gl JSON
+EXTENSIONS = {"json": ".vl.json", "html": ".html", "png": ".png"}
+MAP_EXTENSION = ".deck.json"
+
+# Values of a widget exported by one task of the pool (each task starts the app once)
+CHUNK = 16
+
+
+### Inputs
+def input_hashes():
+    # Hash of the data files and of every module of the app except app.py, whose chart functions are hashed one by one
+    paths = [CSV_PATH, CONTINENTS_PATH, GEOJSON_PATH] + sorted(
+        f"./{path}" for path in glob.glob("*.py") if path != "app.py"
+    )
+    return {path: file_hash(path) for path in paths}
+
+def chart_hashes(path=APP):
+    # Hash of the source of every exported chart function, plus the rest of the app (pages, helpers, data loading)
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    nodes = ast.parse(source).body
+    hashes = {}
+    rest = []
+    for node in nodes:
+        segment = ast.get_source_segment(source, node)
+        if isinstance(node, ast.FunctionDef) and node.name in EXPORTS:
+            hashes[node.name] = hashlib.sha256(segment.encode()).hexdigest()
+        else:
+            rest.append(segment)
+    hashes["app"] = hashlib.sha256("\n".join(rest).encode()).hexdigest()
+    return hashes
+
+def fingerprint(inputs, charts, chart, widget, value, fmt):
+    # Everything an output depends on: a file is exported again only when its fingerprint changes
+    key = [sorted(inputs.items()), charts["app"], charts[chart], chart, widget, value, fmt]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+### Plan
+def find_widget(app, key):
+    for widget in [*app.slider, *app.selectbox, *app.multiselect]:
+        if widget.key == key:
+            return widget
+    raise KeyError(f"No slider, select box or multiselect with key {key!r} on the page")
+
+def widget_values(app, key):
+    # Every valid value of a widget, as the app computes it: the years of a slider, the options of a select box or
+    # of a multiselect, and the combinations of the values of several widgets (as lists)
+    from streamlit.testing.v1.element_tree import Slider
+
+    if isinstance(key, tuple):
+        return [list(values) for values in itertools.product(*(widget_values(app, k) for k in key))]
+    widget = find_widget(app, key)
+    if isinstance(widget, Slider):
+        return list(range(int(widget.min), int(widget.max) + 1))
+    return list(widget.options)
+
+def set_widget(app, key, value):
+    # Give a widget (or several) the value of an output, without running the app
+    from streamlit.testing.v1.element_tree import Multiselect
+
+    if isinstance(key, tuple):
+        for k, v in zip(key, value):
+            set_widget(app, k, v)
+        return
+    widget = find_widget(app, key)
+    widget.set_value([value] if isinstance(widget, Multiselect) else value)
+
+def start_app(page):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP, default_timeout=120)
+    app.session_state["page"] = page
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{page}: {app.exception[0].value}")
+    return app
+
+def output_path(chart, widget, value, fmt):
+    extension = MAP_EXTENSION if chart.startswith("map_") else EXTENSIONS[fmt]
+    if widget is None:
+        return f"{chart}/default{extension}"
+    name = "-".join(re.sub(r"[^\w-]+", "_", str(v)) for v in (value if isinstance(value, list) else [value]))
+    return f"{chart}/{widget}-{name}{extension}"
+
+def plan(charts, fmt):
+    # Every output of the export: (chart, widget, value, path), reading the values from one run of each page
+    outputs = []
+    pages = {}
+    for chart in charts:
+        page, widgets = EXPORTS[chart]
+        if not widgets:
+            outputs.append((chart, None, None, output_path(chart, None, None, fmt)))
+            continue
+        if page not in pages:
+            pages[page] = start_app(page)
+        for widget, key in widgets.items():
+            for value in widget_values(pages[page], key):
+                outputs.append((chart, widget, value, output_path(chart, widget, value, fmt)))
+    return outputs
+
+
+### Export (in the worker processes)
+def write_chart(app, chart, path, fmt):
+    # Save the chart drawn by the last run; False if the chart function drew nothing (e.g. no data)
+    import charts
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if chart.startswith("map_"):
+        decks = app.get("deck_gl_json_chart")
+        if not decks:
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(decks[0].proto.json)
+        return True
+
+    recorded = charts.RECORDED.get(chart)
+    if recorded is None:
+        return False
+    recorded.save(path, format=fmt)
+    return True
+
+def export_task(task):
+    import charts
+
+    # Start the page once, then move one widget through its values, saving the chart after every run
+    page, chart, widget, outputs, fmt, folder = task
+    charts.RECORDED = {}
+    app = start_app(page)
+    exported = []
+    for value, path in outputs:
+        if widget is not None:
+            set_widget(app, EXPORTS[chart][1][widget], value)
+            charts.RECORDED.clear()
+            app.run()
+            if app.exception:
+                raise RuntimeError(f"{chart} ({widget} = {value}): {app.exception[0].value}")
+        if write_chart(app, chart, os.path.join(folder, path), fmt):
+            exported.append((path, os.path.getsize(os.path.join(folder, path))))
+        else:
+            exported.append((None, 0))
+    return exported
+
+
+### Manifest
+def read_manifest(folder):
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {entry["key"]: entry for entry in json.load(f)["outputs"]}
+
+def write_manifest(folder, inputs, entries):
+    with open(os.path.join(folder, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "inputs": inputs,
+            "outputs": entries,
+        }, f, indent=2)
+
+def export(folder=EXPORT_DIR, fmt="json", charts=None, jobs=None, force=False):
+    # Export every chart for every value of its widgets, skipping the outputs whose inputs haven't changed
+    inputs = input_hashes()
+    hashes = chart_hashes()
+    previous = read_manifest(folder)
+    charts = charts or list(EXPORTS)
+
+    entries = {}
+    tasks = {}
+    for chart, widget, value, path in plan(charts, fmt):
+        key = f"{chart}/{widget}/{value}"
+        entry = {
+            "key": key, "chart": chart, "page": EXPORTS[chart][0], "widget": widget, "value": value,
+            "format": "deck" if chart.startswith("map_") else fmt, "path": path,
+            "fingerprint": fingerprint(inputs, hashes, chart, widget, value, fmt), "bytes": 0,
+        }
+        old = previous.get(key)
+        if (not force and old is not None and old["fingerprint"] == entry["fingerprint"] and
+                (old["path"] is None or os.path.exists(os.path.join(folder, old["path"])))):
+            entries[key] = old
+            continue
+        entries[key] = entry
+        tasks.setdefault((chart, widget), []).append(entry)
+
+    # Outputs of the exported charts that are no longer produced (e.g. a country without data any more); the
+    # outputs of the other charts (--only) stay in the folder and in the manifest as they are
+    removed = [
+        entry["path"] for key, entry in previous.items()
+        if entry["chart"] in charts and key not in entries and entry["path"]
+    ]
+    others = [entry for entry in previous.values() if entry["chart"] not in charts]
+    for path in removed:
+        if os.path.exists(os.path.join(folder, path)):
+            os.remove(os.path.join(folder, path))
+
+    chunks = [
+        (EXPORTS[chart][0], chart, widget, [(entry["value"], entry["path"]) for entry in todo[i:i + CHUNK]], fmt, folder)
+        for (chart, widget), todo in tasks.items()
+        for i in range(0, len(todo), CHUNK)
+    ]
+    exported = 0
+    os.makedirs(folder, exist_ok=True)
+    # Spawned workers: polars doesn't support fork, and every worker loads the data and the geometry once
+    with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(export_task, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            _, chart, widget, outputs, _, _ = futures[future]
+            for (value, _), (path, size) in zip(outputs, future.result()):
+                entry = entries[f"{chart}/{widget}/{value}"]
+                entry["path"], entry["bytes"] = path, size
+                exported += path is not None
+            print(f"{chart} {widget or ''}: {len(outputs)} done", file=sys.stderr)
+
+    write_manifest(folder, inputs, others + list(entries.values()))
+    return exported, len(entries) - sum(len(todo) for todo in tasks.values()), len(removed)
+
+
+# python export.py [--format json|html|png] [--out ./export] [--jobs 4] [--only map_access ...] [--force]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every chart and map of the dashboard as static files")
+    parser.add_argument("--format", choices=list(EXTENSIONS), default="json",
+                        help="format of the Altair charts (maps are always deck.gl JSON)")
+    parser.add_argument("--out", default=EXPORT_DIR, help="output folder, with the manifest of the export")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--only", nargs="+", choices=list(EXPORTS), help="export only these charts")
+    parser.add_argument("--force", action="store_true", help="export again the outputs that are up to date")
+    args = parser.parse_args()
+
+    if args.format == "png":
+        try:
+            import vl_convert  # noqa: F401
+        except ImportError:
+            parser.error("PNG export needs vl-convert-python (pip install vl-convert-python)")
+
+    # Through the module: the app replaces __main__ while it runs, so the tasks must not refer to it
+    import export
+    exported, skipped, removed = export.export(args.out, args.format, args.only, args.jobs, args.force)
+    print(f"{exported} files exported, {skipped} up to date, {removed} removed; manifest: {os.path.join(args.out, MANIFEST)}")
@@ -0,0 +1,87 @@
+import functools
+import json
+import os
+import pickle
+import sys
+
+from preprocessing import SNAPSHOT_DIR, file_hash
+from shared import freeze
+
+
+# World borders shipped with the app; the remote URL is only used to refresh them
+GEOJSON_PATH = "./countries.geo.json"
+GEOJSON_URL = "https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json"
+
+
+def geometry_cache_path(path, digest):
+    # Pre-parsed copy of the GeoJSON, e.g. .snapshots/countries.geo-3f2a9c0d1e4b5a69.pickle
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path) or ".", SNAPSHOT_DIR, f"{name}-{digest[:16]}.pickle")
+
+def write_geometry_cache(path, digest=None):
+    digest = digest or file_hash(path)
+    cache_path = geometry_cache_path(path, digest)
+    with open(path, encoding="utf-8") as f:
+        geojson = json.load(f)
+
+    # Write to a temporary file and rename it, so readers never see half a file
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(geojson, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+    # Remove the caches of older versions of the GeoJSON
+    name = os.path.basename(cache_path).rsplit("-", 1)[0]
+    folder = os.path.dirname(cache_path)
+    for entry in os.listdir(folder):
+        if entry.startswith(f"{name}-") and entry.endswith(".pickle") and os.path.join(folder, entry) != cache_path:
+            os.remove(os.path.join(folder, entry))
+
+    return geojson
+
+@functools.lru_cache(maxsize=None)
+def load_geometry(path=GEOJSON_PATH):
+    # Loaded once per process and shared: read-only (mappingproxies and tuples), so that a change raises
+    return freeze(read_geometry(path))
+
+def read_geometry(path=GEOJSON_PATH):
+    digest = file_hash(path)
+    cache_path = geometry_cache_path(path, digest)
+    if os.path.exists(cache_path):
+        # Fast path: no JSON parsing
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    # No cache for this GeoJSON yet: build it (or just parse the JSON, on a read-only disk)
+    try:
+        return write_geometry_cache(path, digest)
+    except OSError:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+def refresh_geometry(path=GEOJSON_PATH, url=GEOJSON_URL, timeout=30):
+    import requests
+
+    # Download the GeoJSON and replace the local copy
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    geojson = response.json()
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+    load_geometry.cache_clear()
+    write_geometry_cache(path)
+    return geojson
+
+
+# Build step: python geometry.py [--refresh]
+if __name__ == "__main__":
+    if "--refresh" in sys.argv[1:]:
+        refresh_geometry()
+        print(f"{GEOJSON_PATH} downloaded from {GEOJSON_URL}")
+    write_geometry_cache(GEOJSON_PATH)
+    print(f"Geometry cache written to {geometry_cache_path(GEOJSON_PATH, file_hash(GEOJSON_PATH))}")
@@ -0,0 +1,130 @@
+import collections
+
+import numpy as np
+import polars as pl
+
+from shared import freeze
+
+
+### Year index
+def build_year_index(data):
+    # Sort by year (stable, so each year keeps the original country order)
+    data = data.sort("year", maintain_order=True)
+
+    # Run-length encode the sorted years to get the offset range of each year
+    index = {}
+    offset = 0
+    for run in data.get_column("year").rle().to_list():
+        # Slices are zero-copy views on the sorted frame
+        index[int(run["value"])] = data.slice(offset, run["len"])
+        offset += run["len"]
+    return index
+
+
+### Country index
+# Frame sorted by country and year, offset range of every country, and the years as a NumPy array
+CountryIndex = collections.namedtuple("CountryIndex", ["frame", "offsets", "years"])
+
+def build_country_index(data):
+    # Sort by country, then by year, so that every country is a contiguous range sorted by year
+    data = data.sort(["Country Name", "year"], maintain_order=True)
+
+    # Run-length encode the sorted names to get the offset range of each country
+    offsets = {}
+    offset = 0
+    for run in data.get_column("Country Name").rle().to_list():
+        offsets[run["value"]] = (offset, offset + run["len"])
+        offset += run["len"]
+    return CountryIndex(data, offsets, data.get_column("year").to_numpy())
+
+def country_rows(index, country, years=None):
+    # Offset range of a country, narrowed to an inclusive (first, last) year range by binary search
+    start, end = index.offsets[country]
+    if years is not None:
+        first, last = years
+        country_years = index.years[start:end]
+        start, end = (
+            start + np.searchsorted(country_years, first, side="left"),
+            start + np.searchsorted(country_years, last, side="right"),
+        )
+    return start, end
+
+def query_countries(index, countries, years=None):
+    # Rows of the given countries (in that order), optionally only in an inclusive (first, last) year range
+    ranges = [country_rows(index, country, years) for country in countries if country in index.offsets]
+    if len(ranges) == 1:
+        # Zero-copy view on the sorted frame
+        start, end = ranges[0]
+        return index.frame.slice(start, end - start)
+    return index.frame[np.concatenate([np.arange(start, end) for start, end in ranges] or [np.arange(0)])]
+
+
+### Availability index
+# Sorted countries, years, and for every indicator a countries x years matrix telling which values are not null
+# (read-only; answers are memoized in cache, since they only depend on the data)
+Availability = collections.namedtuple("Availability", ["countries", "years", "matrix", "cache"])
+
+def build_availability_index(data, indicators):
+    # Position of every row in the matrices: dense rank of the country, offset of the year
+    countries = data.get_column("Country Name").unique().sort()
+    first = data.get_column("year").min()
+    years = np.arange(first, data.get_column("year").max() + 1)
+    rows = data.get_column("Country Name").rank("dense").to_numpy() - 1
+    columns = data.get_column("year").to_numpy() - first
+
+    matrix = {}
+    for indicator in indicators:
+        available = np.zeros((len(countries), len(years)), dtype=bool)
+        available[rows, columns] = data.get_column(indicator).is_not_null().to_numpy()
+        matrix[indicator] = available
+    return Availability(tuple(countries.to_list()), freeze(years), freeze(matrix), {})
+
+def available(availability, indicators):
+    # Countries x years matrix of the values where all the indicators are available
+    key = ("available", tuple(indicators))
+    if key not in availability.cache:
+        availability.cache[key] = freeze(
+            np.logical_and.reduce([availability.matrix[indicator] for indicator in indicators])
+        )
+    return availability.cache[key]
+
+def available_countries(availability, indicators):
+    # Sorted countries with at least one year where all the indicators are available
+    key = ("countries", tuple(indicators))
+    if key not in availability.cache:
+        mask = available(availability, indicators).any(axis=1)
+        availability.cache[key] = tuple(country for country, ok in zip(availability.countries, mask) if ok)
+    return availability.cache[key]
+
+def available_years(availability, indicators):
+    # First and last year in which at least one country has all the indicators
+    key = ("years", tuple(indicators))
+    if key not in availability.cache:
+        years = availability.years[available(availability, indicators).any(axis=0)]
+        availability.cache[key] = (int(years[0]), int(years[-1]))
+    return availability.cache[key]
+
+def country_coverage(availability, indicator, countries):
+    # Country x year cells of some countries (sorted), telling whether the indicator has a value, read from the
+    # matrix rows of these countries
+    key = ("country coverage", indicator, tuple(countries))
+    if key not in availability.cache:
+        rows = np.flatnonzero(np.isin(availability.countries, countries))
+        availability.cache[key] = freeze(pl.DataFrame({
+            "Country Name": np.repeat(np.array(availability.countries)[rows], len(availability.years)),
+            "year": np.tile(availability.years, len(rows)).astype(np.uint16),
+            "available": availability.matrix[indicator][rows].ravel(),
+        }))
+    return availability.cache[key]
+
+def coverage(availability):
+    # Share of the countries with data, for every indicator and year
+    if "coverage" not in availability.cache:
+        availability.cache["coverage"] = freeze(pl.DataFrame({
+            "indicator": np.repeat(list(availability.matrix), len(availability.years)),
+            "year": np.tile(availability.years, len(availability.matrix)).astype(np.uint16),
+            "countries": np.concatenate([matrix.sum(axis=0) for matrix in availability.matrix.values()]).astype(np.uint32),
+        }).with_columns(
+            (pl.col("countries") / len(availability.countries) * 100).alias("coverage")
+        ))
+    return availability.cache["coverage"]
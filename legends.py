@@ -0,0 +1,63 @@
+import functools
+import html
+
+import numpy as np
+
+from coloring import MISSING_COLOR, color_table, normalize
+from profiling import timed
+
+
+# Number of color stops of the gradients
+GRADIENT_STOPS = 32
+
+
+def gradient_css(colormap_name):
+    # CSS gradient (bottom to top) with the colors of the colormap's lookup table
+    table = color_table(colormap_name)[:-3]
+    positions = np.linspace(0, 1, GRADIENT_STOPS)
+    index = np.minimum((positions * len(table)).astype(int), len(table) - 1)
+    stops = ", ".join(
+        f"rgb({r}, {g}, {b}) {100 * position:.1f}%"
+        for (r, g, b), position in zip(table[index].tolist(), positions)
+    )
+    return f"linear-gradient(to top, {stops})"
+
+def legend_html(colormap_name, ticks, positions, text, missing_color):
+    # Title, vertical color bar with ticks and "No Data" box, in white for the dark theme
+    title = "<br>".join(html.escape(line.strip()) for line in text.split("\n"))
+    tick_labels = "".join(
+        f'<div style="position: absolute; bottom: {100 * position:.2f}%; left: 30px; '
+        f'transform: translateY(50%); white-space: nowrap;">&#8211; {html.escape(tick)}</div>'
+        for tick, position in zip(ticks, positions)
+    )
+    r, g, b = missing_color
+    return f"""
+        <div style="color: white; font-size: 13px;">
+            <div style="margin-bottom: 12px;">{title}</div>
+            <div style="position: relative; width: 22px; height: 260px; background: {gradient_css(colormap_name)};">
+                {tick_labels}
+            </div>
+            <div style="display: flex; align-items: center; margin-top: 14px;">
+                <div style="width: 22px; height: 14px; background: rgb({r}, {g}, {b});"></div>
+                <div style="margin-left: 8px;">No Data</div>
+            </div>
+        </div>
+    """
+
+@functools.lru_cache(maxsize=None)
+@timed("legend")
+def create_legend(colormap_name, min_rate, max_rate, text, missing_color=MISSING_COLOR):
+    # Linear color bar from min_rate to max_rate
+    ticks = np.linspace(min_rate, max_rate, num=6)
+    positions = normalize(ticks, min_rate, max_rate)
+    return legend_html(colormap_name, [f"{tick:g}" for tick in ticks], positions, text, missing_color)
+
+@functools.lru_cache(maxsize=None)
+@timed("legend")
+def create_legend_imports(colormap_name, min_rate, max_rate, missing_color=MISSING_COLOR):
+    # Diverging color bar centered at 0: ticks are placed like TwoSlopeNorm places them
+    tick_values = np.linspace(min_rate, max_rate, num=6)
+    if 0 not in tick_values:
+        tick_values = np.unique(np.append(tick_values, 0))
+    positions = normalize(tick_values, min_rate, max_rate, vcenter=0)
+    return legend_html(colormap_name, [f"{v:.2f}" for v in tick_values], positions, "Energy \n Imports (%)", missing_color)
@@ -0,0 +1,126 @@
+import functools
+import json
+
+import numpy as np
+import polars as pl
+import pydeck as pdk
+
+from coloring import colorize
+from geometry import load_geometry
+from shared import freeze
+from profiling import timed
+
+
+# Stands for the GeoJSON features in the deck spec until they are spliced in
+FEATURES_PLACEHOLDER = "@@features@@"
+
+
+@functools.lru_cache(maxsize=None)
+def map_geometry():
+    # Country code and name of every feature, plus its geometry serialized to JSON once per process
+    features = load_geometry()["features"]
+    countries = freeze(pl.DataFrame({
+        "Country Code": [feature["id"] for feature in features],
+        "name": [feature["properties"]["name"] for feature in features],
+    }))
+    geometries = tuple(json.dumps(feature["geometry"], separators=(",", ":"), default=dict) for feature in features)
+    return countries, geometries
+
+def build_map_frames(data, columns, colormap_name, vmin, vmax, vcenter=None):
+    # Attributes and colors of a map for every year, in one pass (the first column is colored)
+    countries, _ = map_geometry()
+    years = data.get_column("year").unique().sort().to_list()
+    data = data.with_columns(pl.col("Country Code").cast(pl.String))
+
+    # One matrix per column, with a row per feature of the map and a column per year
+    values = {}
+    for column in columns:
+        wide = countries.select("Country Code").join(
+            data.pivot(on="year", index="Country Code", values=column),
+            on="Country Code",
+            how="left",
+            maintain_order="left"
+        )
+        values[column] = np.round(wide.select(str(year) for year in years).to_numpy().astype(float), 2)
+
+    # A country without the colored value has no data at all, as in the single-year maps
+    missing = np.isnan(values[columns[0]])
+    for column in columns[1:]:
+        values[column][missing] = np.nan
+
+    # Colors of every country in every year
+    colors = colorize(values[columns[0]], colormap_name, vmin, vmax, vcenter)
+
+    frames = {}
+    for j, year in enumerate(years):
+        attributes = countries.with_columns(
+            pl.Series(column, values[column][:, j]).fill_nan(None)
+            for column in columns
+        )
+        frames[int(year)] = (attributes, colors[:, j])
+    return frames
+
+def features_json(attributes, colors):
+    # GeoJSON features: the pre-serialized geometry plus this rerun's properties and colors
+    _, geometries = map_geometry()
+    properties = attributes.drop("Country Code").with_columns(
+        pl.Series("fill_color", colors, dtype=pl.Array(pl.UInt8, 3))
+    ).write_ndjson().splitlines()
+    return "[" + ",".join(
+        f'{{"type":"Feature","geometry":{geometry},"properties":{row}}}'
+        for geometry, row in zip(geometries, properties)
+    ) + "]"
+
+
+class MapDeck(pdk.Deck):
+    # Deck whose GeoJSON is spliced into the spec, instead of being serialized again by pydeck
+    def __init__(self, features, **kwargs):
+        super().__init__(**kwargs)
+        self.features = features
+
+    @timed("serialize")
+    def to_json(self):
+        features = vars(self).pop("features")
+        try:
+            spec = super().to_json()
+        finally:
+            self.features = features
+        return spec.replace(json.dumps(FEATURES_PLACEHOLDER), features)
+
+class SerializedDeck:
+    # Deck serialized once, shown again without being built: st.pydeck_chart only reads its JSON and tooltip
+    def __init__(self, deck):
+        self.spec = deck.to_json()
+        self._tooltip = deck._tooltip
+
+    def to_json(self):
+        return self.spec
+
+@timed("deck")
+def map_deck(attributes, colors, tooltip):
+    # Create a GeoJSON layer for the map
+    geojson_layer = pdk.Layer(
+        "GeoJsonLayer",
+        data=FEATURES_PLACEHOLDER,
+        pickable=True,
+        filled=True,
+        stroked=True,
+        get_fill_color="properties.fill_color",
+        get_line_color=[0, 0, 0],
+        line_width_min_pixels=1
+    )
+
+    # Set the initial view of the map
+    view_state = pdk.ViewState(
+        latitude=35,
+        longitude=15,
+        zoom=0.4,
+        pitch=0
+    )
+
+    return MapDeck(
+        features_json(attributes, colors),
+        layers=[geojson_layer],
+        initial_view_state=view_state,
+        tooltip=tooltip,
+    )
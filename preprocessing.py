@@ -0,0 +1,391 @@
+import datetime
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+import polars as pl
+
+from aggregates import CUBE_SCHEMA, build_continent_cube
+from continents import CONTINENT, CONTINENTS_PATH, load_continents
+
+
+# Folder (next to the CSV) where the preprocessed snapshots are stored
+SNAPSHOT_DIR = ".snapshots"
+SNAPSHOT_FILES = ("world_data.arrow", "data.arrow", "continent_cube.arrow")
+
+# Bumped when the layout of the frames changes, so that older snapshots are rebuilt
+SNAPSHOT_VERSION = 4
+
+# Fingerprints of the rows of the CSV, kept with the snapshot, and the log of the rows revised by every new export
+FINGERPRINTS_FILE = f"fingerprints-v{SNAPSHOT_VERSION}.arrow"
+CHANGELOG_FILE = "changes.jsonl"
+
+# WDI indicators used by the dashboard: Series Code -> column, in the order of the columns
+INDICATORS = {
+    "EG.ELC.ACCS.ZS": "total_rate",        # Access to electricity (% of population)
+    "EG.ELC.ACCS.RU.ZS": "rural_rate",     # Access to electricity, rural (% of rural population)
+    "EG.ELC.ACCS.UR.ZS": "urban_rate",     # Access to electricity, urban (% of urban population)
+    "EG.ELC.NUCL.ZS": "nuclear",           # Electricity production from nuclear sources (% of total)
+    "EG.ELC.HYRO.ZS": "hydroelectric",     # Electricity production from hydroelectric sources (% of total)
+    "EG.ELC.FOSL.ZS": "oil_gas_coal",      # Electricity production from oil, gas and coal sources (% of total)
+    "EG.ELC.RNWX.ZS": "renewable",         # Electricity production from renewable sources, excluding hydroelectric (% of total)
+    "NY.GDP.PCAP.KD": "GDP",               # GDP per capita (constant 2015 US$)
+    "EG.IMP.CONS.ZS": "energy_imports",    # Energy imports, net (% of energy use)
+}
+
+# Identifier columns of a DataBank export; the bulk download calls the series "indicators"
+ID_COLUMNS = ["Country Name", "Country Code", "Series Name", "Series Code"]
+BULK_ID_COLUMNS = {"Indicator Name": "Series Name", "Indicator Code": "Series Code"}
+
+NULL_VALUES = ["null", "NA", "NaN", "", ".."]
+
+# Canonical schema of the frames (names and codes are Enums of the values found in the CSV)
+SCHEMA = {
+    "Country Name": pl.Enum,
+    "Country Code": pl.Enum,
+    "year": pl.UInt16,
+    **{column: pl.Float32 for column in INDICATORS.values()},
+    "Continent": CONTINENT,
+}
+
+
+def scan_wdi(url):
+    # Only the header is read here: years are "1960 [YR1960]" in DataBank exports and "1960" in the bulk download
+    columns = pl.scan_csv(url, infer_schema=False).collect_schema().names()
+    year_columns = [column for column in columns if column[:4].isdigit()]
+
+    return pl.scan_csv(
+        url,
+        null_values=NULL_VALUES,
+        schema_overrides={column: pl.Float64 for column in year_columns}
+    ).rename(
+        {column: name for column, name in BULK_ID_COLUMNS.items() if column in columns}
+    ).select(
+        [*ID_COLUMNS, *year_columns]
+    )
+
+def read_series(url):
+    # Only the rows of the dashboard's indicators (the footer notes and the blank rows have no code):
+    # the filter is pushed down to the CSV reader, so the other rows are dropped chunk by chunk while parsing
+    return scan_wdi(url).filter(
+        pl.col("Series Code").is_in(list(INDICATORS)) & pl.col("Country Code").is_not_null()
+    ).drop("Series Name").collect()
+
+def read_values(url):
+    # Read the dashboard's indicators from the CSV
+    data = read_series(url)
+
+    # A code that is not in the CSV would give a missing column
+    missing = set(INDICATORS) - set(data.get_column("Series Code").unique())
+    if missing:
+        raise ValueError(f"Indicators not found in {url}: {', '.join(sorted(missing))}")
+
+    # Unpivot the DataFrame to long format: one row per country, series and year
+    return data.unpivot(
+        index=["Country Name", "Country Code", "Series Code"],
+        variable_name="year",
+        value_name="rate"
+    ).with_columns(
+        pl.col("year").str.slice(0, 4).cast(pl.UInt16).alias("year")
+    )
+
+def reshape(values):
+    # Pivot the DataFrame to wide format, with a column per indicator (null if a country has no row for it)
+    data = values.pivot(
+        index=["Country Name", "Country Code", "year"],
+        on="Series Code",
+        values="rate"
+    )
+    data = data.with_columns(
+        pl.lit(None, pl.Float64).alias(code) for code in INDICATORS if code not in data.columns
+    )
+
+    # Name the columns after the indicators
+    data = data.select(
+        ["Country Name", "Country Code", "year", *INDICATORS]
+    ).rename(INDICATORS)
+
+    # Continent of every country, from the precomputed table (manual assignments and groups included)
+    return data.join(load_continents(), on="Country Code", how="left")
+
+def build_frames(values):
+    data = reshape(values)
+
+    # Compact types: Enums instead of repeated strings, Float32 indicators
+    data = data.with_columns(
+        pl.col("Country Name").cast(pl.Enum(sorted(data.get_column("Country Name").unique()))),
+        pl.col("Country Code").cast(pl.Enum(sorted(data.get_column("Country Code").unique()))),
+        pl.col(list(INDICATORS.values())).cast(pl.Float32)
+    )
+
+    world_data=data.filter(pl.col("Country Name")=="World")
+    data=data.filter(pl.col("Country Name")!="World")
+
+    # Continent x year x indicator statistics, computed once with the data
+    continent_cube = build_continent_cube(data, list(INDICATORS.values()))
+
+    return world_data, data, continent_cube
+
+def build_data(url):
+    return build_frames(read_values(url))
+
+
+def validate_schema(frame, schema=SCHEMA):
+    # Refuse a frame that doesn't have the canonical schema, instead of failing later in a chart
+    if frame.columns != list(schema):
+        raise ValueError(f"Unexpected columns {frame.columns}, expected {list(schema)}")
+    for column, dtype in schema.items():
+        if frame.schema[column] != dtype:
+            raise ValueError(f"Column {column!r} is {frame.schema[column]}, expected {dtype}")
+    return frame
+
+
+### Snapshot
+def file_hash(url):
+    # Hash the content of the file: a new version gets a new snapshot (hashed again only when the file changes)
+    stat = os.stat(url)
+    return content_hash(url, stat.st_size, stat.st_mtime_ns)
+
+@functools.lru_cache(maxsize=64)
+def content_hash(url, size, mtime):
+    with open(url, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def snapshot_hash(url):
+    # The snapshot depends on the CSV, on the continent table and on the layout of the frames
+    digest = hashlib.sha256(str(SNAPSHOT_VERSION).encode())
+    for path in (url, CONTINENTS_PATH):
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+def snapshot_path(url, digest):
+    # One folder per CSV content, e.g. .snapshots/WDICSV-3f2a9c0d1e4b5a69
+    name = os.path.splitext(os.path.basename(url))[0]
+    return os.path.join(os.path.dirname(url) or ".", SNAPSHOT_DIR, f"{name}-{digest[:16]}")
+
+def write_snapshot(url, digest=None):
+    digest = digest or snapshot_hash(url)
+    path = snapshot_path(url, digest)
+    values = read_values(url)
+    fingerprints = fingerprint_rows(values)
+
+    # A new version of a CSV that had a snapshot: only the rows it revises are rebuilt, and they are logged
+    previous = previous_snapshot(url, path)
+    frames = None
+    if previous is not None:
+        previous_frames = read_snapshot(previous)
+        changes = changed_rows(pl.read_ipc(os.path.join(previous, FINGERPRINTS_FILE)), fingerprints)
+        frames = refresh_frames(previous_frames, values, changes)
+        refresh = "incremental" if frames is not None else "full"
+    if frames is None:
+        frames = build_frames(values)
+
+    # Write into a temporary folder and rename it, so readers never see half a snapshot
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    for frame, file_name in zip(frames, SNAPSHOT_FILES):
+        # Uncompressed IPC, so that it can be memory-mapped
+        frame.write_ipc(os.path.join(tmp_path, file_name), compression="uncompressed")
+    fingerprints.write_ipc(os.path.join(tmp_path, FINGERPRINTS_FILE))
+    try:
+        os.replace(tmp_path, path)
+        published = True
+    except OSError:
+        # Another process wrote the same snapshot first (and logged its changes)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        published = False
+    if previous is not None and published:
+        write_changes(url, previous, path, change_log(previous_frames, frames, changes), refresh)
+
+    # Remove the snapshots of older versions of the CSV
+    name = os.path.basename(path).rsplit("-", 1)[0]
+    folder = os.path.dirname(path)
+    for entry in os.listdir(folder):
+        if entry.startswith(f"{name}-") and os.path.join(folder, entry) != path and ".tmp-" not in entry:
+            shutil.rmtree(os.path.join(folder, entry), ignore_errors=True)
+
+    return path, frames
+
+def read_snapshot(path):
+    # Memory-map the Arrow files instead of parsing and reshaping the CSV
+    return tuple(
+        pl.read_ipc(os.path.join(path, file_name), memory_map=True)
+        for file_name in SNAPSHOT_FILES
+    )
+
+### Incremental refresh
+def fingerprint_rows(values):
+    # One hash per (country, series) row of the CSV, over its non-null (year, value) pairs: a new export changes
+    # the fingerprints of the rows it revises and no other (empty year columns added at the end don't count).
+    # Polars hashes can change between versions: then every row looks revised, and the refresh redoes them all
+    return values.drop_nulls("rate").group_by(["Country Name", "Country Code", "Series Code"]).agg(
+        pl.struct("year", "rate").hash().sum().alias("fingerprint")
+    ).sort(["Country Code", "Series Code"])
+
+def changed_rows(previous, fingerprints):
+    # (country, series) rows added, removed or revised since the previous fingerprints
+    fingerprint = pl.col("fingerprint")
+    return previous.join(
+        fingerprints, on=["Country Name", "Country Code", "Series Code"], how="full", coalesce=True, suffix="_new"
+    ).filter(
+        fingerprint.ne_missing(pl.col("fingerprint_new"))
+    ).select(
+        "Country Name", "Country Code",
+        pl.col("Series Code").replace_strict(INDICATORS).alias("indicator"),
+        pl.when(fingerprint.is_null()).then(pl.lit("added"))
+            .when(pl.col("fingerprint_new").is_null()).then(pl.lit("removed"))
+            .otherwise(pl.lit("updated")).alias("change")
+    ).sort(["Country Name", "indicator"])
+
+def refresh_frames(frames, values, changes):
+    # The previous frames with only the rows of the revised countries rebuilt, and only the continent statistics
+    # they enter recomputed; None when the new export can't be merged into them
+    world_data, data, continent_cube = frames
+    previous = pl.concat([world_data, data])
+    rows = reshape(values.filter(pl.col("Country Code").is_in(changes.get_column("Country Code").unique())))
+
+    # Same countries (the Enums of the frames) and years, and the continent table hasn't changed since (every row
+    # of the CSV has every year, so the countries are those of the first year)
+    names = pl.col("Country Name", "Country Code").cast(pl.String)
+    continents = previous.select(pl.col("Country Code").cast(pl.String), "Continent").unique()
+    first_year = values.filter(pl.col("year") == values.item(0, "year"))
+    if (
+        set(first_year.select("Country Name", "Country Code").iter_rows()) !=
+            set(previous.select(names).unique().iter_rows()) or
+        set(values.get_column("year").unique()) != set(previous.get_column("year").unique()) or
+        not continents.equals(
+            continents.select("Country Code").join(load_continents(), on="Country Code", how="left").select(continents.columns)
+        )
+    ):
+        return None
+    # A new export that revises no row (e.g. only its "Last Updated" date changed)
+    if changes.is_empty():
+        return frames
+
+    # Rows of the revised countries, replaced in place (every country has a row for every year)
+    rows = rows.with_columns(
+        pl.col("Country Name").cast(data.schema["Country Name"]),
+        pl.col("Country Code").cast(data.schema["Country Code"]),
+        pl.col(list(INDICATORS.values())).cast(pl.Float32)
+    )
+    world_data, data = (
+        frame.update(rows, on=["Country Code", "year"], include_nulls=True)
+        for frame in (world_data, data)
+    )
+
+    # Continent x indicator cells of the revised rows: their statistics are computed again, the others are kept
+    cells = changes.join(
+        rows.select(pl.col("Country Code").cast(pl.String), "Continent").unique(), on="Country Code"
+    ).drop_nulls("Continent").select("Continent", "indicator").unique()
+    if cells.is_empty():
+        # Only countries outside the continents (World) were revised
+        return world_data, data, continent_cube
+    fresh = build_continent_cube(
+        data.filter(pl.col("Continent").is_in(cells.get_column("Continent").unique())),
+        cells.get_column("indicator").unique().sort().to_list()
+    ).with_columns(pl.col("indicator").cast(pl.String)).join(cells, on=["Continent", "indicator"], how="semi")
+    kept = continent_cube.with_columns(pl.col("indicator").cast(pl.String)).join(
+        cells, on=["Continent", "indicator"], how="anti"
+    )
+    continent_cube = pl.concat([kept, fresh]).with_columns(
+        pl.col("indicator").cast(continent_cube.schema["indicator"])
+    ).sort(["indicator", "Continent", "year"])
+
+    return world_data, data, continent_cube
+
+def change_log(previous_frames, frames, changes):
+    # Revised (country, indicator) pairs, with the years whose value changed
+    def pairs(frames):
+        return pl.concat(frames[:2]).filter(
+            pl.col("Country Code").cast(pl.String).is_in(changes.get_column("Country Code").unique())
+        ).unpivot(
+            index=["Country Code", "year"],
+            on=list(INDICATORS.values()),
+            variable_name="indicator",
+            value_name="value"
+        ).with_columns(pl.col("Country Code").cast(pl.String)).join(
+            changes, on=["Country Code", "indicator"], how="semi"
+        )
+
+    years = pairs(previous_frames).join(
+        pairs(frames), on=["Country Code", "indicator", "year"], how="full", coalesce=True, suffix="_new"
+    ).filter(
+        pl.col("value").ne_missing(pl.col("value_new"))
+    ).group_by(["Country Code", "indicator"]).agg(pl.col("year").sort().alias("years"))
+    return changes.join(years, on=["Country Code", "indicator"], how="left", maintain_order="left")
+
+def last_updated(url):
+    # Date in the "Last Updated" footer of a DataBank export (None in the bulk download)
+    with open(url, "rb") as f:
+        f.seek(max(os.path.getsize(url) - 4096, 0))
+        match = re.search(rb"Last Updated: *([^,\r\n]+)", f.read())
+    return match.group(1).decode() if match else None
+
+def previous_snapshot(url, path):
+    # Snapshot of an earlier version of the CSV, with its fingerprints (None on the first build)
+    name = os.path.basename(path).rsplit("-", 1)[0]
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        return None
+    snapshots = [
+        os.path.join(folder, entry) for entry in os.listdir(folder)
+        if entry.startswith(f"{name}-") and ".tmp-" not in entry and os.path.join(folder, entry) != path and
+            os.path.exists(os.path.join(folder, entry, FINGERPRINTS_FILE))
+    ]
+    return max(snapshots, key=os.path.getmtime, default=None)
+
+def write_changes(url, previous, path, changes, refresh):
+    # One JSON line per new version of the CSV, with the revised (country, indicator) pairs
+    entry = {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "csv": url,
+        "last_updated": last_updated(url),
+        "previous": os.path.basename(previous),
+        "snapshot": os.path.basename(path),
+        "refresh": refresh,
+        "changes": changes.rename({"Country Name": "country", "Country Code": "code"}).to_dicts(),
+    }
+    with open(os.path.join(os.path.dirname(path), CHANGELOG_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def indicator_versions(url):
+    # Version of every indicator: hash of the fingerprints of its rows, so that what is derived from some
+    # indicators only is kept when a new export revises the others
+    digest = snapshot_hash(url)
+    path = os.path.join(snapshot_path(url, digest), FINGERPRINTS_FILE)
+    if not os.path.exists(path):
+        # No snapshot (read-only disk): every indicator changes with the CSV
+        return {column: digest for column in INDICATORS.values()}
+    fingerprints = pl.read_ipc(path).sort(["Series Code", "Country Code"])
+    return {
+        INDICATORS[code]: hashlib.sha256(rows.hash_rows().to_numpy().tobytes()).hexdigest()
+        for (code,), rows in fingerprints.group_by("Series Code", maintain_order=True)
+    }
+
+def load_data(url):
+    digest = snapshot_hash(url)
+    path = snapshot_path(url, digest)
+    if os.path.isdir(path):
+        frames = read_snapshot(path)
+    else:
+        # No snapshot for this CSV yet: build it (or just the frames, on a read-only disk)
+        try:
+            _, frames = write_snapshot(url, digest)
+        except OSError:
+            frames = build_data(url)
+    return tuple(
+        validate_schema(frame, schema)
+        for frame, schema in zip(frames, (SCHEMA, SCHEMA, CUBE_SCHEMA))
+    )
+
+
+# Build step: python preprocessing.py [path/to/WDICSV.csv]
+if __name__ == "__main__":
+    csv_url = sys.argv[1] if len(sys.argv) > 1 else "./WDICSV.csv"
+    snapshot, _ = write_snapshot(csv_url)
+    print(f"Snapshot written to {snapshot}")
@@ -0,0 +1,215 @@
+import collections
+import contextlib
+import datetime
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+
+# Opt-in with the query parameters of the page: ?debug=1 times the reruns, ?debug=profile also samples them
+DEBUG_PARAM = "debug"
+
+# One JSON line per rerun (or fragment rerun), to be aggregated offline
+PROFILE_LOG_PATH = "./.profiles/reruns.jsonl"
+
+# Seconds between two samples of the sampling profile, and functions kept in the record
+SAMPLE_INTERVAL = 0.005
+PROFILE_TOP = 30
+
+# Reruns kept in the session for the debug panel
+HISTORY = 20
+
+# Rerun being timed by this thread (every session runs its script in its own thread), None when disabled
+_state = threading.local()
+
+
+class Sampler:
+    # Sampling profiler: a thread that records the stack of the script thread every SAMPLE_INTERVAL
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        # Functions by number of samples in which they are running (self) or on the stack (total), leaving
+        # out the frames that every sample shares (thread and script runner)
+        self.stopped.set()
+        self.thread.join()
+        stacks = list(self.stacks)
+        common = 0
+        while stacks and common < min(map(len, stacks)) - 1 and len({stack[common] for stack in stacks}) == 1:
+            common += 1
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack[common:]):
+                total[function] += count
+        return {
+            "interval": self.interval,
+            "samples": sum(self.stacks.values()),
+            "functions": [
+                {"function": function, "self": own[function], "total": count}
+                for function, count in total.most_common(PROFILE_TOP)
+            ],
+        }
+
+
+def debug_mode():
+    import streamlit as st
+
+    # None (off), "profile" (timings and sampling profile) or any other value (timings)
+    return st.query_params.get(DEBUG_PARAM)
+
+def start_rerun(page=None, fragment=None):
+    # Start timing the rerun, if the debug mode is on. A record still open on this thread belongs to a rerun that
+    # was interrupted before it could finish it: its sampler is stopped and it is written as it is
+    stale = getattr(_state, "rerun", None)
+    if stale is not None:
+        stale["interrupted"] = True
+        finish_rerun()
+    mode = debug_mode()
+    if mode is None:
+        _state.rerun = None
+        return None
+    _state.rerun = {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "page": page,
+        "fragment": fragment,
+        "seconds": None,
+        "stages": {},
+        "charts": {},
+        "start": time.perf_counter(),
+        "sampler": Sampler().start() if mode == "profile" else None,
+    }
+    _state.chart = None
+    return _state.rerun
+
+def finish_rerun(page=None):
+    # Stop timing the rerun, write it to the log and keep it in the session for the debug panel
+    rerun = getattr(_state, "rerun", None)
+    if rerun is None:
+        return None
+    _state.rerun = None
+    rerun["seconds"] = time.perf_counter() - rerun.pop("start")
+    rerun["page"] = rerun["page"] or page
+    sampler = rerun.pop("sampler")
+    if sampler is not None:
+        rerun["profile"] = sampler.stop()
+    write_record(rerun)
+
+    import streamlit as st
+    history = st.session_state.setdefault("profiling_history", [])
+    history.append(rerun)
+    del history[:-HISTORY]
+    return rerun
+
+def write_record(record, path=PROFILE_LOG_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+@contextlib.contextmanager
+def stage(name):
+    # Time a stage of the chart being drawn (or of the rerun, outside the charts); no-op when disabled
+    rerun = getattr(_state, "rerun", None)
+    if rerun is None:
+        yield
+        return
+    stages = _state.chart["stages"] if _state.chart is not None else rerun["stages"]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0) + time.perf_counter() - start
+
+def timed(name):
+    # Decorator version of stage
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def fragment_rerun():
+    # True while Streamlit reruns some fragments only (the script's own record, if any, is not running)
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return bool(ctx is not None and ctx.fragment_ids_this_run)
+
+def profiled(function):
+    # Time a chart function and its stages; a fragment rerun (only this chart) is a record of its own
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        own_rerun = getattr(_state, "rerun", None) is None or fragment_rerun()
+        if own_rerun and start_rerun(fragment=function.__name__) is None:
+            return function(*args, **kwargs)
+
+        chart = {"seconds": None, "stages": {}}
+        _state.rerun["charts"][function.__name__] = chart
+        _state.chart = chart
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            chart["seconds"] = time.perf_counter() - start
+            chart["stages"]["other (widgets, Altair spec)"] = chart["seconds"] - sum(chart["stages"].values())
+            _state.chart = None
+            if own_rerun:
+                import streamlit as st
+                finish_rerun(st.session_state.get("page"))
+    return wrapper
+
+def debug_panel():
+    import streamlit as st
+
+    # Sidebar panel with the timings of the last reruns, shown only in debug mode
+    history = st.session_state.get("profiling_history")
+    if debug_mode() is None or not history:
+        return
+    with st.sidebar.expander("Debug: rerun timings", expanded=False):
+        rerun = history[-1]
+        st.markdown(f"**Last rerun:** {rerun['seconds'] * 1e3:.1f} ms ({rerun['page']})")
+        st.dataframe(
+            [{"chart": "(page)", "stage": name, "ms": round(seconds * 1e3, 2)} for name, seconds in rerun["stages"].items()] +
+            [
+                {"chart": chart, "stage": name, "ms": round(seconds * 1e3, 2)}
+                for chart, timings in rerun["charts"].items()
+                for name, seconds in timings["stages"].items()
+            ],
+            hide_index=True
+        )
+        st.markdown("**Reruns of this session** (fragment reruns show up at the next page rerun)")
+        st.dataframe(
+            [
+                {"time": record["time"], "fragment": record["fragment"] or "", "ms": round(record["seconds"] * 1e3, 1)}
+                for record in reversed(history)
+            ],
+            hide_index=True
+        )
+        if "profile" in rerun:
+            st.markdown(f"**Sampling profile** ({rerun['profile']['samples']} samples every {SAMPLE_INTERVAL * 1e3:.0f} ms)")
+            st.dataframe(rerun["profile"]["functions"], hide_index=True)
+        st.caption(f"Every rerun is appended to {PROFILE_LOG_PATH}")
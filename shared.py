@@ -0,0 +1,62 @@
+import types
+
+import numpy as np
+import polars as pl
+
+
+class ReadOnlyError(TypeError):
+    pass
+
+
+def read_only(*args, **kwargs):
+    raise ReadOnlyError(
+        "This object is shared by every session and must not be modified: work on a copy "
+        "(e.g. frame.clone() or frame.with_columns(...))"
+    )
+
+
+class SharedFrame(pl.DataFrame):
+    # DataFrame held once per process and shared by every session: in-place changes raise ReadOnlyError,
+    # while every derived frame (filter, select, with_columns, slices...) is a plain DataFrame
+    @classmethod
+    def _from_pydf(cls, py_df):
+        return pl.DataFrame._from_pydf(py_df)
+
+    __setitem__ = insert_column = replace_column = extend = drop_in_place = read_only
+    columns = property(pl.DataFrame.columns.fget, read_only)
+
+    def hstack(self, columns, *, in_place=False):
+        if in_place:
+            read_only()
+        return super().hstack(columns)
+
+    def vstack(self, other, *, in_place=False):
+        if in_place:
+            read_only()
+        return super().vstack(other)
+
+    def shrink_to_fit(self, *, in_place=False):
+        if in_place:
+            read_only()
+        return super().shrink_to_fit()
+
+
+def freeze(value):
+    # Read-only view of a shared value, without copying the data: frames become SharedFrames, arrays are
+    # marked read-only, dicts become mappingproxies and lists tuples (recursively)
+    if isinstance(value, SharedFrame):
+        return value
+    if isinstance(value, pl.DataFrame):
+        frame = SharedFrame.__new__(SharedFrame)
+        frame._df = value._df
+        return frame
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value
+    if isinstance(value, (dict, types.MappingProxyType)):
+        return types.MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return type(value)._make(freeze(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value